@@ -99,7 +99,8 @@ setup(
     install_requires=['termcolor >= 1.1.0',
                       'Mako >= 1.0',
                       'bottle >= 0.12.0',
-                      'CommonMark >= 0.6.4'],
+                      'CommonMark >= 0.6.4',
+                      'scandir >= 1.5; python_version < "3.5"'],
     setup_requires=[],
     package_dir={'': 'src'},
     packages=['lolikit', 'lolikit.subcommands'],
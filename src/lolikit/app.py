@@ -35,6 +35,7 @@ import mako.lookup as ML
 import CommonMark
 
 from . import utils
+from . import watcher
 
 
 mimetypes.types_map['.md'] = 'text/x-markdown'
@@ -129,6 +130,8 @@ class _LoliWebLogic:
         self.rootdir = rootdir
         self.ignore_patterns = ignore_patterns
         self.users = users
+        self._ignore_matcher = utils.get_ignore_matcher(ignore_patterns)
+        self._index = watcher.ProjectIndex(rootdir)
 
         self.bottleapp = bottle.Bottle()
         self._logger = get_logger()
@@ -145,8 +148,8 @@ class _LoliWebLogic:
             __file__).parent / 'data' / 'serve' / 'static'
 
     def __check_ignore_filepath(self, filepath):
-        if len(utils.filted_ignore(
-                [filepath], self.rootdir, self.ignore_patterns)) == 0:
+        if self._ignore_matcher.is_ignored(
+                str(filepath.relative_to(self.rootdir))):
             raise bottle.HTTPError(404)
 
     def __url2filepath(self, relative_url):
@@ -156,9 +159,9 @@ class _LoliWebLogic:
         return filepath
 
     def __get_dir(self, filepath):
-        if filepath.is_dir():
+        if self._index.is_dir(filepath):
             return filepath
-        elif filepath.exists():
+        elif self._index.exists(filepath):
             return filepath.parent
         else:
             return None
@@ -175,7 +178,7 @@ class _LoliWebLogic:
                         ' (source mode) ' if current_mode == 'source' else ''))
 
         rel_filepath = str(filepath.relative_to(self.rootdir))
-        dirmark = '/' if filepath.is_dir() else ''
+        dirmark = '/' if self._index.is_dir(filepath) else ''
         page_title = get_page_title(filepath, current_mode, page_title)
         description = description or page_title
         return {'page_title': page_title,
@@ -193,14 +196,17 @@ class _LoliWebLogic:
                         ...
                     ]}
         """
-        paths = sorted(list(dirpath.glob('*')),
-                       key=lambda p: (
-                           not p.is_dir(), not p.name.endswith('.md'), str(p)))
-        paths = utils.filted_ignore(paths, self.rootdir, self.ignore_patterns)
+        entries = sorted(self._index.listdir(dirpath),
+                         key=lambda e: (
+                             not e[1], not e[0].name.endswith('.md'),
+                             str(e[0])))
+        dir_paths = {p for p, is_dir in entries if is_dir}
+        paths = self._ignore_matcher.filter(
+            [p for p, _ in entries], self.rootdir)
         array = list(
             zip([p.name for p in paths],
                 [str(p.relative_to(self.rootdir)) for p in paths],
-                ['/' if p.is_dir() else '' for p in paths]))
+                ['/' if p in dir_paths else '' for p in paths]))
         return {'prepend_url': prepend_url,
                 'array': array}
 
@@ -215,11 +221,11 @@ class _LoliWebLogic:
         paths = [p for p in reversed(filepath.parents)
                  if self.rootdir in p.parents or self.rootdir == p]
         paths.append(filepath)
-        paths = utils.filted_ignore(paths, self.rootdir, self.ignore_patterns)
+        paths = self._ignore_matcher.filter(paths, self.rootdir)
         array = list(
             zip([p.name for p in paths],
                 [str(p.relative_to(self.rootdir)) for p in paths],
-                ['/' if p.is_dir() else '' for p in paths]))
+                ['/' if self._index.is_dir(p) else '' for p in paths]))
         return {'prepend_url': prepend_url,
                 'array': array}
 
@@ -253,9 +259,9 @@ class _LoliWebLogic:
 
     def __get_mix_result(self, urlpath, prepend_url):
         filepath = self.__url2filepath(urlpath)
-        if filepath is None:
+        if filepath is None or not self._index.exists(filepath):
             raise bottle.HTTPError(404)
-        elif filepath.is_dir():
+        elif self._index.is_dir(filepath):
             return self.__get_dir_result(filepath, prepend_url=prepend_url)
         else:
             if filepath.name.endswith('.md'):
@@ -0,0 +1,371 @@
+#########################################################################
+#  The MIT License (MIT)
+#
+#  Copyright (c) 2014~2016 CIVA LIN (林雪凡)
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files
+#  (the "Software"), to deal in the Software without restriction, including
+#  without limitation the rights to use, copy, modify, merge, publish,
+#  distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so,
+#  subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+#  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+##########################################################################
+
+
+import collections
+import contextlib
+import json
+import os
+import time
+
+try:
+    import sqlite3
+except ImportError:  # python be built without sqlite
+    sqlite3 = None
+
+from . import projectwalker
+from . import utils
+
+
+_SCHEMA_VERSION = '4'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT);
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER,
+    entry_count INTEGER,
+    subdir_names TEXT,
+    resource_names TEXT,
+    other_size INTEGER);
+CREATE TABLE IF NOT EXISTS notes (
+    dir TEXT,
+    name TEXT,
+    mode INTEGER,
+    size INTEGER,
+    atime_ns INTEGER,
+    mtime_ns INTEGER,
+    ctime_ns INTEGER,
+    PRIMARY KEY (dir, name));
+'''
+
+_NOTE_COLUMNS = 'mode, size, atime_ns, mtime_ns, ctime_ns'
+
+# a directory changed in this period may be changed again within the same
+# mtime tick, so we never trust it in next refresh.
+_RACY_SECONDS = 2
+
+# readers only wait for a checkpoint, but a writer should not keep others
+# (e.g., `loli serve`) waiting, the data will be refreshed next time.
+_READ_TIMEOUT = 5.0
+_WRITE_TIMEOUT = 0.2
+
+# the WAL mode need shared memory, which not work on these file systems
+_NETWORK_FS_TYPES = {
+    'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'ncpfs', 'afs', '9p', 'ceph',
+    'glusterfs', 'lustre', 'fuse.sshfs', 'fuse.glusterfs', 'fuse.rclone'}
+
+
+def _is_network_fs(path):
+    """test the path is on a network file system (linux only)"""
+    try:
+        with open('/proc/self/mounts') as f:
+            mounts = [line.split()[1:3] for line in f if line.strip()]
+    except OSError:
+        return False
+    path = os.path.realpath(str(path))
+    fs_type = None
+    mount_point_len = -1
+    for mount_point, mount_fs_type in mounts:
+        mount_point = mount_point.replace('\\040', ' ')
+        if ((path == mount_point or
+                path.startswith(mount_point.rstrip('/') + '/')) and
+                len(mount_point) > mount_point_len):
+            fs_type = mount_fs_type
+            mount_point_len = len(mount_point)
+    return fs_type in _NETWORK_FS_TYPES
+
+
+def connect(path, schema=''):
+    """connect to a sqlite store which may be shared by several processes
+
+    The store use the WAL journal mode, so readers never block (and never
+    be blocked by) the writer, and always see a consistent snapshot
+    within a transaction. On a network file system (or if WAL cannot be
+    used) the store fall back to the DELETE journal mode, where readers
+    and the writer may wait each other.
+
+    return: a connection in autocommit mode, use transaction() on it.
+    """
+    if not path.parent.exists():
+        path.parent.mkdir(parents=True)
+    conn = sqlite3.connect(
+        str(path), timeout=_READ_TIMEOUT, isolation_level=None)
+    try:
+        if _is_network_fs(path.parent):
+            conn.execute('PRAGMA journal_mode = DELETE')
+        else:
+            # it keep the old mode if WAL is not supported
+            conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        if schema:
+            conn.executescript(schema)
+    except sqlite3.Error:
+        conn.close()
+        raise
+    return conn
+
+
+@contextlib.contextmanager
+def transaction(conn, write=False):
+    """run in a transaction, use `write=True` if want to change the store
+
+    raise: sqlite3.OperationalError if other process is writing the store,
+           or the changes cannot be committed (and are rolled back).
+    """
+    if write:
+        conn.execute('PRAGMA busy_timeout = {:d}'.format(
+            int(_WRITE_TIMEOUT * 1000)))
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+        finally:
+            conn.execute('PRAGMA busy_timeout = {:d}'.format(
+                int(_READ_TIMEOUT * 1000)))
+    else:
+        conn.execute('BEGIN')
+    try:
+        yield conn
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    try:
+        conn.execute('COMMIT')
+    except BaseException:
+        # e.g., SQLITE_BUSY, the transaction may be still open
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+
+
+def _dump_stat(stat):
+    return (stat.st_mode, stat.st_size,
+            stat.st_atime_ns, stat.st_mtime_ns, stat.st_ctime_ns)
+
+
+def _ns_to_float(ns):
+    # the same as os.stat(), so the floats can be compared with its results
+    sec, nsec = divmod(ns, 10 ** 9)
+    return sec + nsec * 1e-9
+
+
+class _CatalogStat(collections.namedtuple('_CatalogStat', [
+        'st_mode', 'st_size', 'st_atime_ns', 'st_mtime_ns', 'st_ctime_ns'])):
+    """the stat result of a note which be read from the catalog, only have
+    the fields used by lolikit (much faster to build than a stat_result)
+    """
+    __slots__ = ()
+
+    @property
+    def st_atime(self):
+        return _ns_to_float(self.st_atime_ns)
+
+    @property
+    def st_mtime(self):
+        return _ns_to_float(self.st_mtime_ns)
+
+    @property
+    def st_ctime(self):
+        return _ns_to_float(self.st_ctime_ns)
+
+
+class NoteCatalog():
+    """A persistent note catalog in "rootdir/.loli/lolikit/catalog.sqlite".
+
+    A directory whose mtime not changed since last refresh will not be
+    listed again, and the stat results of its notes & other files are
+    taken from the catalog too, only its sub-directories will be stat()
+    again. So editing a note in place (which not change the mtime of its
+    directory) will not be noticed until its directory be changed. These
+    notes are in ProjectTree.trusted_paths, use get_fresh_stat() if it
+    matters.
+
+    The file system is scanned outside of any lock, and the result will
+    only be written back if no other process refreshed the catalog in the
+    meantime, so `loli serve`, `loli check` and `loli find` can use it
+    at the same time.
+    """
+    def __init__(self, rootdir, ignore_patterns, workers=1):
+        self.rootdir = rootdir
+        self.ignore_patterns = ignore_patterns
+        self.workers = workers
+        self.path = rootdir / '.loli' / 'lolikit' / 'catalog.sqlite'
+
+    def refresh(self):
+        """update the catalog by current file system
+
+        return: a ProjectTree
+        """
+        if sqlite3 is None:
+            return projectwalker.walk(
+                self.rootdir, self.ignore_patterns, self.workers)
+        try:
+            with contextlib.closing(connect(self.path, _SCHEMA)) as conn:
+                return self.__refresh(conn)
+        except (sqlite3.Error, OSError, ValueError):
+            return projectwalker.walk(
+                self.rootdir, self.ignore_patterns, self.workers)
+
+    def __relstr(self, path):
+        return str(path.relative_to(self.rootdir))
+
+    def __get_meta(self, conn):
+        return dict(conn.execute('SELECT key, value FROM meta'))
+
+    def __is_outdated(self, meta):
+        return (meta.get('version') != _SCHEMA_VERSION or
+                meta.get('ignore_patterns') != self.ignore_patterns)
+
+    def __reset(self, conn):
+        # the columns may be changed between versions
+        conn.execute('DROP TABLE IF EXISTS dirs')
+        conn.execute('DROP TABLE IF EXISTS notes')
+        for statement in _SCHEMA.split(';'):
+            if statement.strip():
+                conn.execute(statement)
+        conn.executemany(
+            'INSERT OR REPLACE INTO meta VALUES (?, ?)',
+            [('version', _SCHEMA_VERSION),
+             ('ignore_patterns', self.ignore_patterns)])
+
+    def __load_scan(self, dir_path, row, note_rows):
+        """rebuild a DirScan from a catalog row without listing directory
+
+        note_rows = [(name, mode, size, atime_ns, mtime_ns, ctime_ns)] of
+                    the notes in this directory
+
+        return: a DirScan or None if something be changed
+        """
+        _, entry_count, subdir_names, resource_names, other_size = row
+        scan = projectwalker.DirScan(dir_path)
+        for name, *stat_row in note_rows:
+            path = dir_path / name
+            scan.stats[path] = _CatalogStat(*stat_row)
+            scan.md_paths.append(path)
+        try:
+            # the changes in sub-directories can only be found by their
+            # own mtime
+            for name in json.loads(subdir_names):
+                path = dir_path / name
+                scan.stats[path] = os.stat(str(path))
+                scan.subdir_paths.append(path)
+        except OSError:
+            return None
+        scan.resource_names = json.loads(resource_names)
+        scan.other_size = other_size
+        scan.entry_count = entry_count
+        scan.reused = True
+        return scan
+
+    def __dump_scan(self, scan, dir_stat, racy_mtime_ns):
+        mtime_ns = dir_stat.st_mtime_ns
+        return (
+            mtime_ns if mtime_ns < racy_mtime_ns else -1,
+            scan.entry_count,
+            json.dumps([p.name for p in scan.subdir_paths]),
+            json.dumps(scan.resource_names),
+            scan.other_size)
+
+    def __scan_dirs(self, old_rows, old_note_rows, root_stat):
+        """return: a list of DirScan in pre-order"""
+        is_ignored = utils.get_ignore_matcher(self.ignore_patterns).match
+
+        def visit(dir_path, dir_stat):
+            if dir_stat is None:
+                dir_stat = root_stat
+            key = self.__relstr(dir_path)
+            row = old_rows.get(key)
+            scan = None
+            if row is not None and row[0] == dir_stat.st_mtime_ns:
+                scan = self.__load_scan(
+                    dir_path, row, old_note_rows.get(key, []))
+            if scan is None:
+                scan = projectwalker.scan_dir(
+                    dir_path, self.rootdir, is_ignored)
+            return scan
+
+        return projectwalker.traverse(self.rootdir, visit, self.workers)
+
+    def __write_dirs(self, conn, old_rows, scans, root_stat, racy_mtime_ns):
+        dir_stats = {self.rootdir: root_stat}
+        for scan in scans:
+            dir_stats.update(scan.stats)
+        new_rows = {self.__relstr(scan.path): self.__dump_scan(
+                    scan, dir_stats[scan.path], racy_mtime_ns)
+                    for scan in scans if not scan.reused}
+        removed_keys = set(old_rows).difference(
+            self.__relstr(scan.path) for scan in scans)
+        conn.executemany('DELETE FROM dirs WHERE path = ?',
+                         [(key,) for key in removed_keys])
+        conn.executemany('DELETE FROM notes WHERE dir = ?',
+                         [(key,) for key in removed_keys.union(new_rows)])
+        conn.executemany('INSERT OR REPLACE INTO dirs VALUES'
+                         ' (?, ?, ?, ?, ?, ?)',
+                         [(key,) + row for key, row in new_rows.items()])
+        conn.executemany(
+            'INSERT INTO notes VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [(self.__relstr(scan.path), path.name) +
+             _dump_stat(scan.stats[path])
+             for scan in scans if not scan.reused
+             for path in scan.md_paths])
+
+    def __refresh(self, conn):
+        # read a consistent snapshot, the writer will not be blocked
+        with transaction(conn):
+            meta = self.__get_meta(conn)
+            outdated = self.__is_outdated(meta)
+            old_rows = {}
+            old_note_rows = collections.defaultdict(list)
+            if not outdated:
+                old_rows = {row[0]: row[1:] for row in conn.execute(
+                    'SELECT path, mtime_ns, entry_count, subdir_names,'
+                    ' resource_names, other_size FROM dirs')}
+                for row in conn.execute(
+                        'SELECT dir, name, {} FROM notes'
+                        ' ORDER BY rowid'.format(_NOTE_COLUMNS)):
+                    old_note_rows[row[0]].append(row[1:])
+
+        racy_mtime_ns = int((time.time() - _RACY_SECONDS) * 1e9)
+        root_stat = os.stat(str(self.rootdir))
+        scans = self.__scan_dirs(old_rows, old_note_rows, root_stat)
+        tree = projectwalker.build_tree(self.rootdir, scans)
+
+        try:
+            with transaction(conn, write=True):
+                if self.__get_meta(conn) != meta:
+                    # refreshed by other process, just use ours this time
+                    return tree
+                if outdated:
+                    self.__reset(conn)
+                self.__write_dirs(
+                    conn, old_rows, scans, root_stat, racy_mtime_ns)
+                conn.execute(
+                    'INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                    ('generation', str(int(meta.get('generation', 0)) + 1)))
+        except sqlite3.OperationalError:
+            # other process is writing, it will be refreshed next time
+            pass
+        return tree
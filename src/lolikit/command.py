@@ -27,7 +27,8 @@
 import abc
 import sys
 
-from . import utils
+from . import projectwalker
+from . import catalog
 
 
 class CanNotDetectEncodingError(Exception):
@@ -38,6 +39,7 @@ class Command(metaclass=abc.ABCMeta):
     def __init__(self, config, rootdir):
         self.rootdir = rootdir
         self.config = config
+        self._project_tree = None
 
     @abc.abstractmethod
     def get_name(self):
@@ -78,21 +80,35 @@ class Command(metaclass=abc.ABCMeta):
         '''
         pass
 
+    def get_project_tree(self):
+        """walk the project once and reuse the result in this command"""
+        if self._project_tree is None:
+            ignore_patterns = self.config['project']['ignore_patterns']
+            workers = self.get_scan_workers()
+            if self.config['project'].getboolean('catalog'):
+                self._project_tree = catalog.NoteCatalog(
+                    self.rootdir, ignore_patterns, workers).refresh()
+            else:
+                self._project_tree = projectwalker.walk(
+                    self.rootdir, ignore_patterns, workers)
+        return self._project_tree
+
+    def get_scan_workers(self):
+        """how many threads can be used to access the file system"""
+        return max(int(self.config['project']['scan_workers']), 1)
+
+    def clear_project_tree(self):
+        """call it after notes or directories be changed by this command"""
+        self._project_tree = None
+
     def get_all_dir_paths(self):
-        paths = self.rootdir.rglob('*/**')
-        return utils.filted_ignore(
-            paths, self.rootdir, self.config['project']['ignore_patterns'])
+        return list(self.get_project_tree().dir_paths)
 
     def get_all_md_paths(self):
-        paths = [p for p in self.rootdir.rglob('*.md') if p.is_file()]
-        return utils.filted_ignore(
-            paths, self.rootdir, self.config['project']['ignore_patterns'])
+        return list(self.get_project_tree().md_paths)
 
     def get_all_resourced_md_paths(self):
-        ignore_patterns = self.config['project']['ignore_patterns']
-        paths = [p for p in self.rootdir.rglob('*.md')
-                 if utils.is_rmd(p, self.rootdir, ignore_patterns)]
-        return utils.filted_ignore(paths, self.rootdir, ignore_patterns)
+        return list(self.get_project_tree().rmd_paths)
 
     def require_rootdir(self):
         if self.rootdir is None:
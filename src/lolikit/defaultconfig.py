@@ -67,6 +67,10 @@ DEFAULT_CONFIG = OD((
         # ^ multiple patterns split by newline
         # all pathname string start with the rootdir
         # auto include: '^.loli($|' + os.sep + ')'
+        ('catalog', 'yes'),
+        # ^ keep a note catalog in ".loli/lolikit" to speed up scanning
+        ('scan_workers', 1),
+        # ^ > 1 to access files concurrently (for NFS, sshfs ...)
         ))),
     ('selector', OD((
         ('editor', _get_default_editor()),
@@ -86,6 +90,20 @@ DEFAULT_CONFIG = OD((
         # ^ one of 'windows', 'mac', 'posix'
         # default == current system mode
         ))),
+    ('find', OD((
+        ('index', 'no'),
+        # ^ keep a trigram index in ".loli/lolikit" to speed up finding
+        ('cache', 'yes'),
+        # ^ keep the results of recent finding in ".loli/lolikit"
+        ('jobs', 1),
+        # ^ how many processes can be used to match notes, 0 = CPU count
+        ('attachment_max_size', 1024),
+        # ^ KB, larger attachments are not matched by "find --attachments"
+        ('file_timeout', 10),
+        # ^ seconds, skip a note if matching it takes longer, 0 = no limit
+        ('query_timeout', 0),
+        # ^ seconds, stop finding if it takes longer, 0 = no limit
+        ))),
     ('serve', OD((
         ('port', '10204'),
         ('allow_remote_access', 'no'),
@@ -0,0 +1,187 @@
+#########################################################################
+#  The MIT License (MIT)
+#
+#  Copyright (c) 2014~2016 CIVA LIN (林雪凡)
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files
+#  (the "Software"), to deal in the Software without restriction, including
+#  without limitation the rights to use, copy, modify, merge, publish,
+#  distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so,
+#  subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+#  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+##########################################################################
+
+
+import contextlib
+import json
+import time
+import zlib
+
+try:
+    import sqlite3
+except ImportError:  # python be built without sqlite
+    sqlite3 = None
+
+from . import catalog
+
+
+_SCHEMA_VERSION = '2'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS queries (
+    key TEXT PRIMARY KEY,
+    results BLOB,
+    used REAL);
+'''
+
+# a note changed in this period may be changed again within the same
+# mtime tick, so we never trust it in next query.
+_RACY_SECONDS = 2
+
+# how many queries be kept, the least recently used will be dropped
+_MAX_QUERIES = 64
+
+
+class QueryCache():
+    """A cache of find results in "rootdir/.loli/lolikit/findcache.sqlite".
+
+    For each query, the result (or not matched) of every candidate note be
+    kept with the note's mtime & size. Next time only the changed notes
+    need be matched again.
+    """
+    def __init__(self, rootdir):
+        self.rootdir = rootdir
+        self.path = rootdir / '.loli' / 'lolikit' / 'findcache.sqlite'
+
+    def __relstr(self, path):
+        return str(path.relative_to(self.rootdir))
+
+    def __get_key(self, patterns, path_patterns):
+        return json.dumps([_SCHEMA_VERSION,
+                           sorted(patterns),
+                           sorted(set(path_patterns or []))])
+
+    def __load(self, key):
+        """return: {relstr: [mtime, size, score, ...]}, score is None if
+        the note be not matched"""
+        if sqlite3 is None:
+            return {}
+        try:
+            with contextlib.closing(
+                    catalog.connect(self.path, _SCHEMA)) as conn:
+                with catalog.transaction(conn):
+                    row = conn.execute(
+                        'SELECT results FROM queries WHERE key = ?',
+                        (key,)).fetchone()
+            if row is None:
+                return {}
+            return json.loads(zlib.decompress(row[0]).decode('utf8'))
+        except (sqlite3.Error, OSError, ValueError, zlib.error):
+            return {}
+
+    def __save(self, key, results):
+        if sqlite3 is None:
+            return
+        blob = zlib.compress(json.dumps(results).encode('utf8'))
+        try:
+            with contextlib.closing(
+                    catalog.connect(self.path, _SCHEMA)) as conn:
+                with catalog.transaction(conn, write=True):
+                    conn.execute(
+                        'INSERT OR REPLACE INTO queries VALUES (?, ?, ?)',
+                        (key, blob, time.time()))
+                    conn.execute(
+                        'DELETE FROM queries WHERE key NOT IN ('
+                        ' SELECT key FROM queries'
+                        ' ORDER BY used DESC LIMIT ?)', (_MAX_QUERIES,))
+        except (sqlite3.Error, OSError):
+            # other process is writing, just not cache it this time
+            pass
+
+    def __get_record(self, cached, path, tree):
+        """return: the cached record of path, or None if it is changed"""
+        stat = tree.get_fresh_stat(path)
+        record = cached.get(self.__relstr(path))
+        if record is not None and record[:2] == [
+                stat.st_mtime, stat.st_size]:
+            return record
+        return None
+
+    def get_cached_scores(self, patterns, path_patterns, paths, tree):
+        """get the results only if all paths are cached and not changed
+
+        return: a list of (path, score, ...) of matched notes, or None
+        """
+        cached = self.__load(self.__get_key(patterns, path_patterns))
+        scores = []
+        for path in paths:
+            record = self.__get_record(cached, path, tree)
+            if record is None:
+                return None
+            if record[2] is not None:
+                scores.append((path,) + tuple(record[2:]))
+        return scores
+
+    def iter_scores(self, patterns, path_patterns, paths, tree, evaluate):
+        """
+        paths    = the candidate notes (in order)
+        tree     = the ProjectTree which have the stat of notes
+        evaluate = a function(paths) yield (path, score, ...) of matched
+                   notes in order, it will be called with the changed notes
+                   only. The items must be JSON serializable. A score of
+                   None means the note cannot be decided this time (e.g.,
+                   too slow), it will be neither yielded nor cached.
+
+        yield: (path, score, ...) of matched notes, the same as
+               evaluate(paths)
+        """
+        key = self.__get_key(patterns, path_patterns)
+        cached = self.__load(key)
+        racy_mtime = time.time() - _RACY_SECONDS
+
+        results = {}
+        changed_paths = []
+        for path in paths:
+            record = self.__get_record(cached, path, tree)
+            if record is not None:
+                results[self.__relstr(path)] = record
+            else:
+                changed_paths.append(path)
+
+        hits = iter(evaluate(changed_paths))
+        hit = next(hits, None)
+        changed_paths = set(changed_paths)
+        for path in paths:
+            relstr = self.__relstr(path)
+            if path in changed_paths:
+                # evaluate() only yield the matched notes in order
+                if hit is not None and hit[0] == path:
+                    result = list(hit[1:])
+                    hit = next(hits, None)
+                    if result[0] is None:
+                        continue
+                else:
+                    result = [None]
+                stat = tree.get_fresh_stat(path)
+                mtime = stat.st_mtime if stat.st_mtime < racy_mtime else -1
+                results[relstr] = [mtime, stat.st_size] + result
+            else:
+                result = results[relstr][2:]
+            if result[0] is not None:
+                yield (path,) + tuple(result)
+
+        # only be reached if all notes be consumed
+        if changed_paths or len(cached) != len(results):
+            self.__save(key, results)
@@ -0,0 +1,363 @@
+#########################################################################
+#  The MIT License (MIT)
+#
+#  Copyright (c) 2014~2016 CIVA LIN (林雪凡)
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files
+#  (the "Software"), to deal in the Software without restriction, including
+#  without limitation the rights to use, copy, modify, merge, publish,
+#  distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so,
+#  subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+#  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+##########################################################################
+
+
+import contextlib
+import re
+import time
+
+try:
+    import sqlite3
+except ImportError:  # python be built without sqlite
+    sqlite3 = None
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # python < 3.11
+    import sre_parse
+    import sre_constants
+
+from . import catalog
+from . import utils
+
+
+_SCHEMA_VERSION = '1'
+
+# how many notes be read before writing them into the index, all their
+# trigrams are kept in memory
+_BATCH_SIZE = 500
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT);
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE,
+    size INTEGER,
+    mtime REAL);
+CREATE TABLE IF NOT EXISTS postings (
+    trigram TEXT,
+    doc INTEGER,
+    PRIMARY KEY (trigram, doc)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc);
+'''
+
+# a note changed in this period may be changed again within the same
+# mtime tick, so we never trust it in next update.
+_RACY_SECONDS = 2
+
+_LITERAL = sre_constants.LITERAL
+_SUBPATTERNS = tuple(getattr(sre_constants, name) for name in (
+    'SUBPATTERN', 'ATOMIC_GROUP') if hasattr(sre_constants, name))
+_REPEATS = tuple(getattr(sre_constants, name) for name in (
+    'MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')
+    if hasattr(sre_constants, name))
+_BRANCH = sre_constants.BRANCH
+
+
+def _is_wide_bigram(gram):
+    """CJK words are often only 2 chars, so index non-ASCII bigrams too"""
+    return len(gram) == 2 and gram[0] > '\x7f' and gram[1] > '\x7f'
+
+
+def get_trigrams(text):
+    """return: a set of trigrams (and non-ASCII bigrams) of the
+    case-folded text"""
+    text = text.lower()
+    grams = {text[i:i + 3] for i in range(len(text) - 2)}
+    grams.update(gram for gram in (
+        text[i:i + 2] for i in range(len(text) - 1))
+        if _is_wide_bigram(gram))
+    return grams
+
+
+def _is_safe_char(char):
+    """a char can be searched in lowered text without case-folding issue
+
+    Uncased chars (e.g., CJK, digits) only match themselves. ASCII letters
+    except "i", "k", "s" (which also match "ı", "İ", "K", "ſ") only
+    match their upper & lower cases.
+    """
+    if char.lower() == char.upper():
+        return True
+    return char < '\x80' and char.lower() not in 'iks'
+
+
+def _and(nodes):
+    nodes = [node for node in nodes if node is not None]
+    flatten = []
+    for node in nodes:
+        if isinstance(node, tuple) and node[0] == 'and':
+            flatten.extend(node[1])
+        else:
+            flatten.append(node)
+    if not flatten:
+        return None
+    elif len(flatten) == 1:
+        return flatten[0]
+    return ('and', flatten)
+
+
+def _or(nodes):
+    if not nodes or any(node is None for node in nodes):
+        return None
+    elif len(nodes) == 1:
+        return nodes[0]
+    return ('or', nodes)
+
+
+def _analyze(subpattern, is_safe_char):
+    """return: a query node which the matched text must satisfy
+
+    A node may be None (match anything), a required literal string
+    (lowered), or a tuple of ('and' | 'or', [node, ...]).
+    """
+    nodes = []
+    literal = []
+
+    def flush():
+        if literal:
+            nodes.append(''.join(literal))
+        del literal[:]
+
+    for op, av in subpattern:
+        if op == _LITERAL and is_safe_char(chr(av)):
+            literal.append(chr(av).lower())
+            continue
+        flush()
+        if op in _SUBPATTERNS:
+            nodes.append(_analyze(av[-1], is_safe_char))
+        elif op in _REPEATS:
+            if av[0] >= 1:
+                nodes.append(_analyze(av[2], is_safe_char))
+        elif op == _BRANCH:
+            nodes.append(_or([_analyze(item, is_safe_char)
+                              for item in av[1]]))
+    flush()
+    return _and(nodes)
+
+
+def map_query(node, func):
+    """replace each literal string in query node by func(literal)"""
+    if node is None:
+        return None
+    elif isinstance(node, str):
+        return func(node)
+    op, nodes = node
+    nodes = [map_query(node, func) for node in nodes]
+    return _and(nodes) if op == 'and' else _or(nodes)
+
+
+def get_literal_query(pattern, raw=False):
+    """analyze a regex pattern into the literal strings it required
+
+    raw = the text will be searched without newline translation, so
+          "\r" & "\n" cannot be a part of required literal strings.
+
+    return: a query node, or None if nothing required.
+    """
+    if raw:
+        def is_safe_char(char):
+            return char not in '\r\n' and _is_safe_char(char)
+    else:
+        is_safe_char = _is_safe_char
+    return _analyze(sre_parse.parse(pattern, re.IGNORECASE), is_safe_char)
+
+
+def get_plain_literal(pattern):
+    """return: the string if the pattern has no regex syntax, or None"""
+    if re.compile(pattern).flags != re.compile('').flags:
+        return None  # inline flags like "(?a)" may change the matching
+    subpattern = sre_parse.parse(pattern, re.IGNORECASE)
+    if len(subpattern) and all(op == _LITERAL for op, _ in subpattern):
+        return ''.join(chr(av) for _, av in subpattern)
+
+
+def _literal_to_grams(literal):
+    grams = [literal[i:i + 3] for i in range(len(literal) - 2)]
+    if _is_wide_bigram(literal):
+        grams.append(literal)
+    return _and(grams)
+
+
+def get_query(patterns):
+    """analyze the regex patterns which all must be matched
+
+    return: a query node of trigrams, or None if nothing can be used to
+            filter notes
+    """
+    return _and([map_query(get_literal_query(pattern), _literal_to_grams)
+                 for pattern in patterns])
+
+
+class TrigramIndex():
+    """A trigram index of note titles & contents in
+    "rootdir/.loli/lolikit/findindex.sqlite".
+
+    Notes are re-indexed when their mtime or size be changed. The index
+    only reduce the candidate notes, they still need to be verified.
+    """
+    def __init__(self, rootdir, workers=1):
+        self.rootdir = rootdir
+        self.workers = workers
+        self.path = rootdir / '.loli' / 'lolikit' / 'findindex.sqlite'
+
+    def __relstr(self, path):
+        return str(path.relative_to(self.rootdir))
+
+    def __read(self, path):
+        """return: (path, trigrams) or (path, None) if cannot be read"""
+        try:
+            with open(str(path), encoding='utf8') as f:
+                content = f.read()
+        except (OSError, UnicodeDecodeError):
+            return path, None
+        return path, get_trigrams(path.stem) | get_trigrams(content)
+
+    def __update(self, conn, tree):
+        """return: a set of changed notes which not in index"""
+        with catalog.transaction(conn):
+            meta = dict(conn.execute('SELECT key, value FROM meta'))
+            docs = {row[0]: row[1:] for row in conn.execute(
+                'SELECT path, size, mtime FROM docs')}
+        if meta.get('version') != _SCHEMA_VERSION:
+            docs = {}
+
+        changed_paths = []
+        for path in tree.md_paths:
+            stat = tree.get_fresh_stat(path)
+            if docs.pop(self.__relstr(path), None) != (
+                    stat.st_size, stat.st_mtime):
+                changed_paths.append(path)
+        if not changed_paths and not docs:
+            return set()
+
+        racy_mtime = time.time() - _RACY_SECONDS
+        unindexed_paths = set(changed_paths)
+        removed_keys = list(docs)
+        try:
+            for start in range(0, max(len(changed_paths), 1), _BATCH_SIZE):
+                # read & split notes without the lock (as NoteCatalog do),
+                # other processes can use the index meanwhile
+                batch = list(utils.concurrent_map(
+                    self.__read, changed_paths[start:start + _BATCH_SIZE],
+                    self.workers))
+                indexed_paths = []
+                with catalog.transaction(conn, write=True):
+                    if self.__get_version(conn) != _SCHEMA_VERSION:
+                        conn.execute('DELETE FROM docs')
+                        conn.execute('DELETE FROM postings')
+                        conn.execute(
+                            'INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                            ('version', _SCHEMA_VERSION))
+                    for key in removed_keys:
+                        self.__delete(conn, key)
+                    for path, trigrams in batch:
+                        if self.__write(conn, tree, path, trigrams,
+                                        racy_mtime):
+                            indexed_paths.append(path)
+                # the postings can only be used after being committed
+                removed_keys = []
+                unindexed_paths.difference_update(indexed_paths)
+        except sqlite3.OperationalError:
+            # other process is writing, just not use the index for the rest
+            pass
+        return unindexed_paths
+
+    def __get_version(self, conn):
+        for (version,) in conn.execute(
+                "SELECT value FROM meta WHERE key = 'version'"):
+            return version
+
+    def __write(self, conn, tree, path, trigrams, racy_mtime):
+        """replace the postings of a note
+
+        return: True if the note is indexed and can be trusted next time
+        """
+        key = self.__relstr(path)
+        self.__delete(conn, key)
+        if trigrams is None:
+            return False
+        stat = tree.get_fresh_stat(path)
+        mtime = stat.st_mtime if stat.st_mtime < racy_mtime else -1
+        doc = conn.execute(
+            'INSERT INTO docs (path, size, mtime) VALUES (?, ?, ?)',
+            (key, stat.st_size, mtime)).lastrowid
+        conn.executemany(
+            'INSERT INTO postings VALUES (?, ?)',
+            ((trigram, doc) for trigram in trigrams))
+        return mtime != -1
+
+    def __delete(self, conn, key):
+        for (doc,) in conn.execute(
+                'SELECT id FROM docs WHERE path = ?', (key,)).fetchall():
+            conn.execute('DELETE FROM postings WHERE doc = ?', (doc,))
+            conn.execute('DELETE FROM docs WHERE id = ?', (doc,))
+
+    def __search(self, conn, node):
+        """return: a set of doc ids"""
+        if isinstance(node, str):
+            return {doc for (doc,) in conn.execute(
+                'SELECT doc FROM postings WHERE trigram = ?', (node,))}
+        op, nodes = node
+        if op == 'and':
+            result = None
+            for node in nodes:
+                docs = self.__search(conn, node)
+                result = docs if result is None else result & docs
+                if not result:
+                    break
+            return result
+        else:
+            result = set()
+            for node in nodes:
+                result |= self.__search(conn, node)
+            return result
+
+    def get_candidates(self, tree, patterns):
+        """update the index & find notes which may match all patterns
+
+        return: a set of note paths, or None if all notes are candidates
+        """
+        query = get_query(patterns)
+        if sqlite3 is None or query is None:
+            return None
+        try:
+            with contextlib.closing(
+                    catalog.connect(self.path, _SCHEMA)) as conn:
+                candidates = self.__update(conn, tree)
+                with catalog.transaction(conn):
+                    docs = self.__search(conn, query)
+                    keys = set()
+                    for doc in docs:
+                        keys.update(key for (key,) in conn.execute(
+                            'SELECT path FROM docs WHERE id = ?', (doc,)))
+        except (sqlite3.Error, OSError, ValueError):
+            return None
+        candidates.update(
+            path for path in tree.md_paths if self.__relstr(path) in keys)
+        return candidates
@@ -0,0 +1,350 @@
+#########################################################################
+#  The MIT License (MIT)
+#
+#  Copyright (c) 2014~2016 CIVA LIN (林雪凡)
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files
+#  (the "Software"), to deal in the Software without restriction, including
+#  without limitation the rights to use, copy, modify, merge, publish,
+#  distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so,
+#  subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+#  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+##########################################################################
+
+
+"""A small boolean query language for "loli find --query".
+
+    QUERY = TERM TERM ...           all terms should be matched
+          | QUERY AND QUERY         the same as above
+          | QUERY OR QUERY
+          | NOT QUERY
+          | ( QUERY )
+
+    TERM  = PATTERN                 match on title or content
+          | "PATTERN WITH SPACES"
+          | title:PATTERN
+          | path:PATTERN            (based on project root dir)
+          | category:PATTERN
+          | content:PATTERN
+          | mtime OP TIME           e.g., mtime>2020-01-31, mtime<7d
+          | size OP SIZE            e.g., size<10k, size>=1m
+
+    OP    = < | <= | > | >= | =
+
+PATTERNs are case-insensitive regexes, the same as "loli find PATTERN".
+"AND", "OR", "NOT" must be uppercase. A TIME is a date (and time) or a
+relative time "Nd", "Nh", "Nw" (= N days, hours, weeks ago). A SIZE is
+bytes with an optional "k", "m", "g" suffix.
+
+Cheap terms (pathnames, titles, stat results) are always evaluated before
+the terms which need the content, so a note will only be read if these
+cannot decide it.
+"""
+
+import operator
+import re
+
+from . import utils
+
+
+class QueryError(Exception):
+    pass
+
+
+# the cost of evaluating a term, cheaper terms are evaluated first
+_COST_NAME = 0
+_COST_STAT = 1
+_COST_CONTENT = 2
+
+_OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '=': operator.eq,
+    }
+
+_TOKEN_RE = re.compile(r'''
+    \s*(?:
+        (?P<paren>[()])
+        | (?P<field>\w+:)?"(?P<quoted>[^"]*)"
+        | (?P<word>[^\s()"]+)
+    )''', re.VERBOSE)
+
+_COMPARE_RE = re.compile(r'^(mtime|size)(<=|>=|<|>|=)(.+)$')
+_FIELDS = ('title', 'path', 'category', 'content')
+_FIELD_RE = re.compile(r'^({}):(.+)$'.format('|'.join(_FIELDS)))
+
+_SIZE_UNITS = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+
+
+class QueryNote():
+    """A note to be evaluated, the content is read at first use only.
+
+    read = a function(path) return the content of a note
+    """
+    def __init__(self, path, rootdir, project_tree, read):
+        self.path = path
+        self.rootdir = rootdir
+        self.project_tree = project_tree
+        self.__read = read
+        self.__content = None
+
+    @property
+    def title(self):
+        return self.path.stem
+
+    @property
+    def root_relative_path(self):
+        return str(self.path.relative_to(self.rootdir))
+
+    @property
+    def category(self):
+        return self.project_tree.get_category(self.path)
+
+    @property
+    def stat(self):
+        return self.project_tree.get_fresh_stat(self.path)
+
+    @property
+    def content(self):
+        if self.__content is None:
+            self.__content = self.__read(self.path)
+        return self.__content
+
+    @property
+    def is_content_read(self):
+        return self.__content is not None
+
+
+class _Term():
+    cost = _COST_NAME
+
+    def get_patterns(self, negative=False):
+        """return: the PATTERNs which should be ranked & highlighted"""
+        return []
+
+
+class _Pattern(_Term):
+    """match on the title or the content"""
+    cost = _COST_CONTENT
+
+    def __init__(self, pattern):
+        try:
+            self.prog = re.compile(pattern, re.IGNORECASE)
+        except re.error as e:
+            raise QueryError(
+                'bad pattern "{}": {}'.format(pattern, e)) from None
+        self.pattern = pattern
+
+    def evaluate(self, note):
+        return bool(self.prog.search(note.title) or
+                    self.prog.search(note.content))
+
+    def get_patterns(self, negative=False):
+        return [] if negative else [self.pattern]
+
+
+class _Field(_Pattern):
+    """match on a field of note"""
+    def __init__(self, field, pattern):
+        super().__init__(pattern)
+        self.field = field
+        self.cost = _COST_CONTENT if field == 'content' else _COST_NAME
+
+    def evaluate(self, note):
+        if self.field == 'title':
+            text = note.title
+        elif self.field == 'path':
+            text = note.root_relative_path
+        elif self.field == 'category':
+            text = note.category
+        else:
+            text = note.content
+        return bool(self.prog.search(text))
+
+    def get_patterns(self, negative=False):
+        if self.field == 'content':
+            return super().get_patterns(negative)
+        return []
+
+
+class _Compare(_Term):
+    """compare the mtime or size of note"""
+    cost = _COST_STAT
+
+    def __init__(self, key, op, value):
+        self.key = key
+        self.op = _OPERATORS[op]
+        if key == 'mtime':
+            self.value = _parse_time(value)
+        else:
+            self.value = _parse_size(value)
+
+    def evaluate(self, note):
+        if self.key == 'mtime':
+            return self.op(note.stat.st_mtime, self.value)
+        else:
+            return self.op(note.stat.st_size, self.value)
+
+
+class _Not(_Term):
+    def __init__(self, child):
+        self.child = child
+        self.cost = child.cost
+
+    def evaluate(self, note):
+        return not self.child.evaluate(note)
+
+    def get_patterns(self, negative=False):
+        return self.child.get_patterns(not negative)
+
+
+class _And(_Term):
+    def __init__(self, children):
+        # sorted() is stable, the terms of the same cost keep the order
+        self.children = sorted(children, key=lambda child: child.cost)
+        self.cost = max(child.cost for child in children)
+
+    def evaluate(self, note):
+        return all(child.evaluate(note) for child in self.children)
+
+    def get_patterns(self, negative=False):
+        return [pattern for child in self.children
+                for pattern in child.get_patterns(negative)]
+
+
+class _Or(_And):
+    def evaluate(self, note):
+        return any(child.evaluate(note) for child in self.children)
+
+
+def _parse_time(value):
+    """return: a timestamp"""
+    try:
+        return utils.parse_time(value)
+    except ValueError as e:
+        raise QueryError(str(e)) from None
+
+
+def _parse_size(value):
+    """return: bytes"""
+    match = re.search(r'^(\d+(?:\.\d+)?)([kmg]?)$', value.lower())
+    if match is None:
+        raise QueryError('bad size "{}"'.format(value))
+    return float(match.group(1)) * _SIZE_UNITS[match.group(2)]
+
+
+def _tokenize(query):
+    """yield: ('(' | ')' | 'AND' | 'OR' | 'NOT' | 'TERM', term or None)"""
+    pos = 0
+    query = query.rstrip()
+    while pos < len(query):
+        match = _TOKEN_RE.match(query, pos)
+        if match is None:
+            raise QueryError('unclosed quote at: {}'.format(query[pos:]))
+        pos = match.end()
+        if match.group('paren'):
+            yield match.group('paren'), None
+        elif match.group('quoted') is not None:
+            field = match.group('field')
+            if field is None:
+                yield 'TERM', _Pattern(match.group('quoted'))
+            elif field[:-1] in _FIELDS:
+                yield 'TERM', _Field(field[:-1], match.group('quoted'))
+            else:
+                raise QueryError('unknown field "{}"'.format(field))
+        else:
+            word = match.group('word')
+            if word in ('AND', 'OR', 'NOT'):
+                yield word, None
+                continue
+            compare_match = _COMPARE_RE.match(word)
+            field_match = _FIELD_RE.match(word)
+            if compare_match:
+                yield 'TERM', _Compare(*compare_match.groups())
+            elif field_match:
+                yield 'TERM', _Field(*field_match.groups())
+            else:
+                yield 'TERM', _Pattern(word)
+
+
+class _Parser():
+    def __init__(self, query):
+        self.tokens = list(_tokenize(query))
+        self.pos = 0
+
+    def peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos][0]
+
+    def next(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise QueryError('empty query')
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise QueryError('unexpected "{}"'.format(self.peek()))
+        return node
+
+    def parse_or(self):
+        children = [self.parse_and()]
+        while self.peek() == 'OR':
+            self.next()
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else _Or(children)
+
+    def parse_and(self):
+        children = [self.parse_not()]
+        while self.peek() not in (None, 'OR', ')'):
+            if self.peek() == 'AND':
+                self.next()
+            children.append(self.parse_not())
+        return children[0] if len(children) == 1 else _And(children)
+
+    def parse_not(self):
+        kind = self.peek()
+        if kind is None:
+            raise QueryError('unexpected end of query')
+        kind, term = self.next()
+        if kind == 'NOT':
+            return _Not(self.parse_not())
+        elif kind == '(':
+            node = self.parse_or()
+            if self.peek() != ')':
+                raise QueryError('missing ")"')
+            self.next()
+            return node
+        elif kind == 'TERM':
+            return term
+        else:
+            raise QueryError('unexpected "{}"'.format(kind))
+
+
+def parse(query, patterns=()):
+    """
+    patterns = more PATTERNs which should be all matched
+
+    return: a query node, which has evaluate(QueryNote) and get_patterns()
+    raise: QueryError if the query is bad
+    """
+    node = _Parser(query).parse()
+    if patterns:
+        node = _And([_Pattern(pattern) for pattern in patterns] + [node])
+    return node
@@ -52,6 +52,7 @@ IS.cmdloop()
 
 
 import cmd
+import heapq
 import math
 import re
 
@@ -80,6 +81,77 @@ class Item():
         return self.task(self.data, extra_line)
 
 
+class LazyItems():
+    def __init__(self, datas, item_factory):
+        """A sequence of Item, each Item only be created when be used.
+
+        datas        = a sequence (support len() and slicing) of data
+        item_factory = a function accept one data and return an Item
+        """
+        self.datas = datas
+        self.item_factory = item_factory
+        self.__items = {}
+
+    def __len__(self):
+        return len(self.datas)
+
+    def __get_item(self, index, data):
+        if index not in self.__items:
+            self.__items[index] = self.item_factory(data)
+        return self.__items[index]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            indexes = range(*index.indices(len(self)))
+            datas = self.datas[index]
+            return [self.__get_item(i, data)
+                    for i, data in zip(indexes, datas)]
+        if index < 0:
+            index += len(self)
+        return self.__get_item(index, self.datas[index])
+
+
+class RankedDatas():
+    def __init__(self, datas, key):
+        """A sequence of datas sorted by key (high to low).
+
+        Only the first pages which be used will be ranked (by a top-K
+        heap), so the selector can show the first page without sorting
+        all datas.
+
+        datas = a list of data
+        key   = a function accept one data and return the sort key
+        """
+        self.__datas = datas
+        self.__key = key
+        self.__ranked = []
+
+    def __len__(self):
+        return len(self.__datas)
+
+    def __iter__(self):
+        self.__rank(len(self))
+        return iter(self.__ranked)
+
+    def __rank(self, count):
+        if count > len(self.__ranked):
+            count = max(count, len(self.__ranked) * 2)
+            # same as sorted(..., reverse=True)[:count], ties keep order
+            self.__ranked = heapq.nlargest(count, self.__datas, key=self.__key)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, _ = index.indices(len(self))
+            self.__rank(max(start, stop))
+        else:
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError('index out of range')
+            self.__rank(index + 1)
+        return self.__ranked[index]
+
+
 class ItemSelector(cmd.Cmd):
     def __init__(self,
                  items,
@@ -90,7 +162,7 @@ class ItemSelector(cmd.Cmd):
                  page_size=10,
                  reverse=False):
         """
-        items = A list of Item object
+        items = A list of Item object (or a LazyItems)
         """
         super().__init__()
 
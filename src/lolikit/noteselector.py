@@ -23,7 +23,10 @@
 #  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 ##########################################################################
 
+import collections
 import datetime as DT
+import itertools
+import json
 import subprocess
 import re
 import sys
@@ -35,10 +38,32 @@ from . import itemselector as IS
 from . import utils
 
 
-class PathInfo():
-    def __init__(self, path, rootdir):
-        self.path = path
-        self.rootdir = rootdir
+_PathRecord = collections.namedtuple(
+    '_PathRecord', ['path', 'rootdir', 'parts', 'mtime', 'atime', 'is_rmd'])
+
+
+class PathInfo(_PathRecord):
+    """A immutable & compact info record of a path.
+
+    All data be collected when created, so the properties never touch
+    the file system.
+    """
+    __slots__ = ()
+
+    def __new__(cls, path, rootdir, stat=None, is_rmd=False):
+        """
+        stat = stat result of the path. (default: call path.stat())
+        """
+        if stat is None:
+            stat = path.stat()
+        return super().__new__(
+            cls,
+            path=path,
+            rootdir=rootdir,
+            parts=path.relative_to(rootdir).parts,
+            mtime=DT.datetime.fromtimestamp(stat.st_mtime),
+            atime=DT.datetime.fromtimestamp(stat.st_atime),
+            is_rmd=is_rmd)
 
     @property
     def filename(self):
@@ -54,47 +79,37 @@ class PathInfo():
 
     @property
     def absolute_path(self):
-        return str(self.path.resolve())
+        return os.path.abspath(str(self.path))
 
     @property
     def absolute_parent_dirpath(self):
-        return str(self.path.parent.resolve())
+        return os.path.dirname(self.absolute_path)
 
-    def __compact_convert(self, path):
-        parts = path.parts
+    def __compact_convert(self, parts):
         if len(parts) >= 3:
             return os.path.sep.join([parts[0], '...', parts[-1]])
         else:
-            return str(path)
+            return os.path.sep.join(parts) or '.'
 
     @property
     def root_relative_path(self):
-        return str(self.path.relative_to(self.rootdir))
+        return os.path.sep.join(self.parts)
 
     @property
     def root_relative_path_compact(self):
-        return self.__compact_convert(self.path.relative_to(self.rootdir))
+        return self.__compact_convert(self.parts)
 
     @property
     def root_relative_dirname(self):
-        return str(self.path.relative_to(self.rootdir).parent)
+        return os.path.sep.join(self.parts[:-1]) or '.'
 
     @property
     def root_relative_dirname_compact(self):
-        return self.__compact_convert(
-            self.path.relative_to(self.rootdir).parent)
+        return self.__compact_convert(self.parts[:-1])
 
     @property
     def top_dirname(self):
-        return self.path.relative_to(self.rootdir).parts[0]
-
-    @property
-    def mtime(self):
-        return DT.datetime.fromtimestamp(self.path.stat().st_mtime)
-
-    @property
-    def atime(self):
-        return DT.datetime.fromtimestamp(self.path.stat().st_atime)
+        return self.parts[0]
 
     def get_properties(self):
         return {
@@ -111,12 +126,30 @@ class PathInfo():
                 self.root_relative_dirname_compact,
             }
 
+    def get_record(self):
+        """return: a OrderedDict for machine-readable output"""
+        return collections.OrderedDict((
+            ('path', self.root_relative_path),
+            ('mtime', self.mtime.isoformat()),
+            ))
+
 
 class NoteInfo(PathInfo):
     """A note info warper"""
-    def __init__(self, path, rootdir, ignore_patterns):
-        super().__init__(path, rootdir)
-        self.ignore_patterns = ignore_patterns
+    __slots__ = ()
+
+    def __new__(cls, path, rootdir, ignore_patterns=None, project_tree=None):
+        """
+        project_tree = a optional ProjectTree which already have the stat
+                       result and resourced or not of this note.
+        """
+        if project_tree is not None:
+            stat = project_tree.get_stat(path)
+            is_rmd = project_tree.is_rmd(path)
+        else:
+            stat = path.stat()
+            is_rmd = utils.is_rmd(path, rootdir, ignore_patterns)
+        return super().__new__(cls, path, rootdir, stat, is_rmd)
 
     @property
     def title(self):
@@ -124,8 +157,7 @@ class NoteInfo(PathInfo):
 
     @property
     def prepend_resourced_icon(self):
-        icon = '+ ' if utils.is_rmd(
-            self.path, self.rootdir, self.ignore_patterns) else '  '
+        icon = '+ ' if self.is_rmd else '  '
         if sys.platform.startswith('win'):
             return icon
         else:
@@ -133,8 +165,7 @@ class NoteInfo(PathInfo):
 
     @property
     def append_resourced_icon(self):
-        icon = ' +' if utils.is_rmd(
-            self.path, self.rootdir, self.ignore_patterns) else '  '
+        icon = ' +' if self.is_rmd else '  '
         if sys.platform.startswith('win'):
             return icon
         else:
@@ -142,7 +173,7 @@ class NoteInfo(PathInfo):
 
     @property
     def category(self):
-        if utils.is_rmd(self.path, self.rootdir, self.ignore_patterns):
+        if self.is_rmd:
             return self.grandparent_dirname
         else:
             return self.parent_dirname
@@ -157,13 +188,31 @@ class NoteInfo(PathInfo):
         })
         return data
 
+    def get_record(self):
+        record = super().get_record()
+        record['title'] = self.title
+        record['rmd'] = self.is_rmd
+        return record
+
 
 def note_item_factory(path, rootdir, text_format,
-                      default_editor, default_file_browser, config):
+                      default_editor, default_file_browser, config,
+                      project_tree=None, get_extra_properties=None):
+    """
+    get_extra_properties = a optional function(noteinfo) return a dict of
+                           more variables for text_format. It only be
+                           called once, when the text be used at first.
+    """
     ignore_patterns = config['project']['ignore_patterns']
+    extra_properties = []
 
     def text_func(data):
-        return text_format.format(**data.get_properties())
+        properties = data.get_properties()
+        if get_extra_properties is not None:
+            if not extra_properties:
+                extra_properties.append(get_extra_properties(data))
+            properties.update(extra_properties[0])
+        return text_format.format(**properties)
 
     def task(data, line):
         def line_decode(line):
@@ -207,17 +256,45 @@ def note_item_factory(path, rootdir, text_format,
         if task_mode in ('open', 'file_browsing'):
             return call_opener(task_mode, opener)
         elif task_mode == 'attachment_browsing':
-            if utils.is_rmd(data.path, rootdir, ignore_patterns):
+            if data.is_rmd:
                 start_attachment_selector(data, config)
             else:
                 print('[cancel]: "{}" not a resourced note.'.format(
                     data.title))
             return False
 
-    noteinfo = NoteInfo(path, rootdir, ignore_patterns)
+    noteinfo = NoteInfo(path, rootdir, ignore_patterns, project_tree)
     return IS.Item(text=text_func, task=task, data=noteinfo)
 
 
+def print_records(records, output, limit=None):
+    """print a line for each record immediately (no selector)
+
+    records = iterable of (PathInfo, extra_fields), extra_fields is a
+              dict which will be appended in the record (e.g., score)
+    output  = 'json' (JSON Lines) or 'plain' (tab-separated values)
+    limit   = stop after print how many records. (None = no limit)
+    """
+    def plain(value):
+        if isinstance(value, bool):
+            return '1' if value else '0'
+        return str(value)
+
+    try:
+        for info, extra_fields in itertools.islice(records, limit):
+            record = info.get_record()
+            record.update(extra_fields)
+            if output == 'json':
+                line = json.dumps(record, ensure_ascii=False)
+            else:
+                line = '\t'.join(plain(value) for value in record.values())
+            print(line, flush=True)
+    except BrokenPipeError:
+        # the reader (e.g., `head`) be closed, just stop quietly
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+
+
 def start_note_selector(note_items, config):
     usage = (
         '\n'
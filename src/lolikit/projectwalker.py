@@ -0,0 +1,235 @@
+#########################################################################
+#  The MIT License (MIT)
+#
+#  Copyright (c) 2014~2016 CIVA LIN (林雪凡)
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files
+#  (the "Software"), to deal in the Software without restriction, including
+#  without limitation the rights to use, copy, modify, merge, publish,
+#  distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so,
+#  subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+#  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+##########################################################################
+
+
+import concurrent.futures
+import os
+
+try:
+    from os import scandir
+except ImportError:  # python < 3.5
+    from scandir import scandir
+
+from . import utils
+
+
+class DirScan():
+    """children of one directory which be found by walker"""
+    def __init__(self, path):
+        self.path = path
+        self.md_paths = []
+        self.subdir_paths = []
+        self.resource_names = []
+        self.stats = {}
+        # ^ {path: stat_result} of notes & sub-directories
+        self.entry_count = 0
+        self.other_size = 0
+        # ^ size of all children which are neither notes nor directories
+        self.reused = False
+        # ^ rebuilt from a catalog rather than listing the directory
+
+    def get_size(self):
+        return self.other_size + sum(
+            stat.st_size for stat in self.stats.values())
+
+
+class ProjectTree():
+    """All notes & directories of a loli project, collected in one pass.
+
+    attributes:
+        md_paths      = a list of note paths.
+        dir_paths     = a list of directory paths. (rootdir not included)
+        rmd_paths     = a list of resourced note paths.
+        stats         = {path: stat_result} of every note and directory.
+        entry_counts  = {dir_path: how many children in this directory}
+                        (ignored children included)
+        total_size    = size (bytes) of all not ignored things.
+        trusted_paths = a set of notes whose stat result come from a
+                        catalog, which may miss in-place edits.
+    """
+    def __init__(self, rootdir):
+        self.rootdir = rootdir
+        self.md_paths = []
+        self.dir_paths = []
+        self.rmd_paths = []
+        self.stats = {}
+        self.entry_counts = {}
+        self.total_size = 0
+        self.trusted_paths = set()
+        self._rmd_path_set = set()
+
+    def is_rmd(self, path):
+        return path in self._rmd_path_set
+
+    def get_stat(self, path):
+        return self.stats[path]
+
+    def get_fresh_stat(self, path):
+        """the same as get_stat(), but never miss in-place edits of notes
+        (e.g., for the content be cached by the stat result)"""
+        if path in self.trusted_paths:
+            try:
+                self.stats[path] = os.stat(str(path))
+            except OSError:  # be removed, keep the old one
+                pass
+            self.trusted_paths.discard(path)
+        return self.stats[path]
+
+    def get_category(self, path):
+        if self.is_rmd(path):
+            return path.parent.parent.name
+        else:
+            return path.parent.name
+
+
+def _is_md_name(name):
+    return os.path.normcase(name).endswith('.md')
+
+
+def scan_dir(dir_path, rootdir, is_ignored):
+    """list one directory and stat() its children
+
+    is_ignored = a function(root_relative_pathname) -> ignored or not.
+                 Ignored children will not be stat() or entered.
+
+    return: a DirScan
+    """
+    scan = DirScan(dir_path)
+    relpath = str(dir_path.relative_to(rootdir))
+    prefix = '' if relpath == '.' else relpath + os.sep
+    try:
+        entries = list(scandir(str(dir_path)))
+    except OSError:
+        entries = []
+    scan.entry_count = len(entries)
+    for entry in entries:
+        if is_ignored(prefix + entry.name):
+            continue
+        try:
+            stat = entry.stat()
+        except OSError:  # broken symlink or be removed
+            continue
+        path = dir_path / entry.name
+        if entry.is_dir(follow_symlinks=False):
+            scan.stats[path] = stat
+            scan.subdir_paths.append(path)
+        elif entry.is_file() and _is_md_name(entry.name):
+            scan.stats[path] = stat
+            scan.md_paths.append(path)
+        else:
+            scan.other_size += stat.st_size
+            if entry.is_file():
+                scan.resource_names.append(entry.name)
+    return scan
+
+
+def traverse(rootdir, visit, workers=1):
+    """visit all directories from the rootdir
+
+    visit   = a function(dir_path, dir_stat) -> DirScan. The dir_stat
+              come from the DirScan of its parent (None for rootdir).
+    workers = visit directories concurrently by a thread pool if > 1.
+              (helpful on high latency file systems, e.g., NFS)
+
+    return: a list of DirScan in pre-order
+    """
+    scans = {}
+    if workers <= 1:
+        stack = [(rootdir, None)]
+        while stack:
+            scan = visit(*stack.pop())
+            scans[scan.path] = scan
+            stack.extend(reversed(
+                [(p, scan.stats[p]) for p in scan.subdir_paths]))
+    else:
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            pending = {executor.submit(visit, rootdir, None)}
+            while pending:
+                done, pending = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    scan = future.result()
+                    scans[scan.path] = scan
+                    pending.update(
+                        executor.submit(visit, p, scan.stats[p])
+                        for p in scan.subdir_paths)
+
+    ordered_scans = []
+    stack = [rootdir]
+    while stack:
+        scan = scans[stack.pop()]
+        ordered_scans.append(scan)
+        stack.extend(reversed(scan.subdir_paths))
+    return ordered_scans
+
+
+def _classify_rmd(scans):
+    """return: a set of resourced note paths
+
+    A resourced note is the only note in its parent directory subtree,
+    and its parent directory have at least one resource file.
+    """
+    subtree_md_counts = {}
+    rmd_paths = set()
+    for scan in reversed(scans):
+        subtree_md_counts[scan.path] = len(scan.md_paths) + sum(
+            subtree_md_counts[p] for p in scan.subdir_paths)
+        if (len(scan.md_paths) == 1 and
+                subtree_md_counts[scan.path] == 1 and
+                scan.resource_names):
+            rmd_paths.add(scan.md_paths[0])
+    return rmd_paths
+
+
+def build_tree(rootdir, scans):
+    """build a ProjectTree by all DirScan (in pre-order)"""
+    tree = ProjectTree(rootdir)
+    for scan in scans:
+        tree.stats.update(scan.stats)
+        tree.entry_counts[scan.path] = scan.entry_count
+        tree.total_size += scan.get_size()
+    tree.md_paths = [p for scan in scans for p in scan.md_paths]
+    tree.trusted_paths = {p for scan in scans if scan.reused
+                          for p in scan.md_paths}
+    tree.dir_paths = [p for scan in scans for p in scan.subdir_paths]
+    tree._rmd_path_set = _classify_rmd(scans)
+    tree.rmd_paths = [p for p in tree.md_paths if p in tree._rmd_path_set]
+    return tree
+
+
+def walk(rootdir, ignore_patterns, workers=1):
+    """walk through the whole project once
+
+    The ignored directories will never be entered, so everything under
+    them be ignored too.
+
+    return: a ProjectTree
+    """
+    is_ignored = utils.get_ignore_matcher(ignore_patterns).match
+
+    def visit(dir_path, dir_stat):
+        return scan_dir(dir_path, rootdir, is_ignored)
+
+    return build_tree(rootdir, traverse(rootdir, visit, workers))
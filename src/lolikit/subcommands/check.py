@@ -66,14 +66,18 @@ class CheckCommand(command.Command):
 
     def run(self, args):
         def get_encoding_error_files():
-            files = []
-            for path in self.get_all_md_paths():
+            def is_encoding_error(path):
                 try:
                     with open(str(path), encoding='utf8') as f:
                         f.read()
+                    return False
                 except UnicodeDecodeError:
-                    files.append(path)
-            return files
+                    return True
+
+            paths = self.get_all_md_paths()
+            return [path for path, error in zip(paths, utils.concurrent_map(
+                    is_encoding_error, paths, self.get_scan_workers()))
+                    if error]
 
         self.require_rootdir()
         enc_error_paths = get_encoding_error_files()
@@ -105,10 +109,9 @@ class CheckCommand(command.Command):
             if args.verbose:
                 self.__verbose_paths_print(paths)
             if args.resolve:
-                if args.always_yes:
-                    resolve_func(paths, args.verbose)
-                elif utils.confirm(confirm_message):
+                if args.always_yes or utils.confirm(confirm_message):
                     resolve_func(paths, args.verbose)
+                    self.clear_project_tree()
 
     def __rm_paths(self, paths, verbose):
         count = 0
@@ -130,17 +133,24 @@ class CheckCommand(command.Command):
         def get_empty_content_paths():
             def get_small_size_paths():
                 small_size = 50
-                small_size_paths = [path for path in self.get_all_md_paths()
-                                    if path.stat().st_size < small_size]
+                tree = self.get_project_tree()
+                small_size_paths = [path for path in tree.md_paths
+                                    if tree.get_stat(path).st_size <
+                                    small_size]
                 return small_size_paths
 
-            small_size_paths = get_small_size_paths()
-            empty_content_paths = []
-            for path in small_size_paths:
+            def is_empty_content(path):
                 with open(str(path), encoding='utf8') as f:
                     content = f.read()
-                if len(content.strip()) == 0:
-                    empty_content_paths.append(path)
+                return len(content.strip()) == 0
+
+            small_size_paths = get_small_size_paths()
+            empty_content_paths = [
+                path for path, empty in zip(
+                    small_size_paths, utils.concurrent_map(
+                        is_empty_content, small_size_paths,
+                        self.get_scan_workers()))
+                if empty]
             return empty_content_paths
 
         paths = get_empty_content_paths()
@@ -152,8 +162,9 @@ class CheckCommand(command.Command):
 
     def __deal_empty_dirs(self, args):
         def get_empty_dirs():
-            empty_child_dirs = [d for d in self.get_all_dir_paths()
-                                if len(tuple(d.iterdir())) == 0]
+            tree = self.get_project_tree()
+            empty_child_dirs = [d for d in tree.dir_paths
+                                if tree.entry_counts[d] == 0]
             return empty_child_dirs
 
         paths = get_empty_dirs()
@@ -216,9 +227,12 @@ class CheckCommand(command.Command):
 
         def get_inconsistent_newline_paths():
             want_newline_mode = self.config[self.get_name()]['newline_mode']
-            paths = [path for path in self.get_all_md_paths()
-                     if get_newline_mode(path) not in (
-                         want_newline_mode, None)]
+            all_paths = self.get_all_md_paths()
+            paths = [path for path, newline_mode in zip(
+                     all_paths, utils.concurrent_map(
+                         get_newline_mode, all_paths,
+                         self.get_scan_workers()))
+                     if newline_mode not in (want_newline_mode, None)]
             return paths
 
         def universalize_newline(paths, verbose):
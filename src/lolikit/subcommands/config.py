@@ -149,7 +149,48 @@ class ConfigCommand(command.Command):
                             '[CONFIGERROR] "serve:users" must contain ":"'
                             ' in each line.')
 
+        def check_project_scan_workers(config):
+            try:
+                if int(config['project']['scan_workers']) < 1:
+                    raise ValueError
+            except ValueError:
+                raise ConfigError(
+                    '[CONFIGERROR] "project:scan_workers" must be a'
+                    ' positive integer.')
+
+        def check_find_jobs(config):
+            try:
+                if int(config['find']['jobs']) < 0:
+                    raise ValueError
+            except ValueError:
+                raise ConfigError(
+                    '[CONFIGERROR] "find:jobs" must be a'
+                    ' non-negative integer.')
+
+        def check_find_attachment_max_size(config):
+            try:
+                if int(config['find']['attachment_max_size']) < 0:
+                    raise ValueError
+            except ValueError:
+                raise ConfigError(
+                    '[CONFIGERROR] "find:attachment_max_size" must be a'
+                    ' non-negative integer.')
+
+        def check_find_timeouts(config):
+            for key in ('file_timeout', 'query_timeout'):
+                try:
+                    if float(config['find'][key]) < 0:
+                        raise ValueError
+                except ValueError:
+                    raise ConfigError(
+                        '[CONFIGERROR] "find:{}" must be a'
+                        ' non-negative number.'.format(key))
+
         try:
+            check_project_scan_workers(self.config)
+            check_find_jobs(self.config)
+            check_find_attachment_max_size(self.config)
+            check_find_timeouts(self.config)
             check_check_newline_mode(self.config)
             check_serve_users(self.config)
             print('Your configuration are looking good.')
@@ -25,12 +25,456 @@
 
 
 import argparse
+import codecs
+import collections
+import concurrent.futures
+import functools
+import itertools
+import mmap
+import os
 import re
+import signal
+import sys
+import threading
+import time
+
+import termcolor as TC
 
 from .. import command
+from .. import findcache
+from .. import findindex
+from .. import findquery
+from .. import utils
+from .. import itemselector as IS
 from .. import noteselector as NS
 
 
+def _compile(patterns):
+    return [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+
+
+def _compile_bytes(patterns):
+    """
+    return: a list of query nodes (see findindex) of byte regexes, which
+            the undecoded content must satisfy if it match the pattern.
+    """
+    def compile_literal(literal):
+        # only ASCII letters are cased in required literals, and byte regex
+        # with IGNORECASE only fold ASCII letters.
+        return re.compile(re.escape(literal.encode('utf8')), re.IGNORECASE)
+
+    return [findindex.map_query(
+            findindex.get_literal_query(pattern, raw=True), compile_literal)
+            for pattern in patterns]
+
+
+def _search_bytes(node, data):
+    if node is None:
+        return True
+    elif not isinstance(node, tuple):
+        return node.search(data) is not None
+    op, nodes = node
+    if op == 'and':
+        return all(_search_bytes(node, data) for node in nodes)
+    else:
+        return any(_search_bytes(node, data) for node in nodes)
+
+
+# the only chars which match an ASCII letter case-insensitively but not
+# be lowered to it ("İ", "ı", "ſ", "K")
+_SPECIAL_FOLD_CHARS = '\u0130\u0131\u017f\u212a'
+
+# how many chars around the first match be shown as {snippet}
+_SNIPPET_WIDTH = 60
+
+# how many bytes of an attachment be read to detect it is binary or not
+_BINARY_CHECK_SIZE = 8192
+
+
+def _get_fast_literal(pattern):
+    """return: the lowered literal if the pattern is a plain string of
+               ASCII or uncased chars, or None"""
+    literal = findindex.get_plain_literal(pattern)
+    if literal and all(char < '\x80' or char.lower() == char.upper()
+                       for char in literal):
+        return literal.lower()
+
+
+class _Matcher():
+    """Match all patterns on notes.
+
+    Plain literal patterns (most queries are words) are searched by
+    str.find() on a lowered copy of the text, which is much faster than
+    a regex, so every extra word costs little. Other patterns still be
+    matched by their own regex.
+    """
+    def __init__(self, patterns):
+        self.progs = _compile(patterns)
+        self.byte_queries = _compile_bytes(patterns)
+        self.literals = [_get_fast_literal(pattern) for pattern in patterns]
+
+    def may_hit(self, title, data):
+        """check the title & undecoded content, return False if the note
+        cannot match all patterns
+
+        Only the required literals be searched, no user regex be run here,
+        so a slow pattern can always be stopped by a _Budget later.
+        """
+        title_data = title.encode('utf8')
+        return all(_search_bytes(byte_query, title_data) or
+                   _search_bytes(byte_query, data)
+                   for byte_query in self.byte_queries)
+
+    def is_hit(self, title, text):
+        """stop at the first match of each pattern"""
+        return all(prog.search(title) or prog.search(text)
+                   for prog in self.progs)
+
+    def count_all(self, text):
+        """count the matches without keeping them
+
+        return: a list of (match_count, matched_length) for each pattern
+        """
+        lowered = None
+        if any(self.literals) and not any(
+                char in text for char in _SPECIAL_FOLD_CHARS):
+            lowered = text.lower()  # the same length as text
+        counts = []
+        for prog, literal in zip(self.progs, self.literals):
+            if literal and lowered is not None:
+                # str.count() is non-overlapping, the same as finditer()
+                count = lowered.count(literal)
+                counts.append((count, count * len(literal)))
+            else:
+                count = length = 0
+                for m in prog.finditer(text):
+                    count += 1
+                    length += m.end() - m.start()
+                counts.append((count, length))
+        return counts
+
+    def find_first(self, text):
+        """return: the offset of the first match of any pattern, or None"""
+        lowered = None
+        if any(self.literals) and not any(
+                char in text for char in _SPECIAL_FOLD_CHARS):
+            lowered = text.lower()
+        offsets = []
+        for prog, literal in zip(self.progs, self.literals):
+            if literal and lowered is not None:
+                offset = lowered.find(literal)
+                if offset >= 0:
+                    offsets.append(offset)
+            else:
+                match = prog.search(text)
+                if match:
+                    offsets.append(match.start())
+        return min(offsets) if offsets else None
+
+
+def _read_hit(path, matcher, attachments=None):
+    """read a note only if it may match all patterns
+
+    The note be searched in bytes (by mmap) first, and only be decoded
+    if it may be hit.
+
+    attachments = {path: [(attachment_path, max_size), ...]}, the text of
+                  attachments will be appended to the content of their
+                  notes.
+
+    return: (path, content), content is None if the note cannot be hit
+    """
+    if attachments and attachments.get(path):
+        # the patterns may only be matched in attachments, so the note
+        # cannot be checked alone
+        texts = [_read_content(path)]
+        for attachment_path, max_size in attachments[path]:
+            text = _read_attachment(attachment_path, max_size)
+            if text is not None:
+                texts.append(text)
+        return path, '\n'.join(texts)
+
+    with open(str(path), mode='rb') as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):  # empty file can not be mapped
+            data = f.read()
+        try:
+            if not matcher.may_hit(path.stem, data):
+                return path, None
+            content = str(data, 'utf8')
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+    if '\r' in content:
+        # the same as universal newlines mode
+        content = content.replace('\r\n', '\n').replace('\r', '\n')
+    return path, content
+
+
+def _read_content(path):
+    """read a note for a query, the same as _read_hit()"""
+    with open(str(path), mode='rb') as f:
+        content = str(f.read(), 'utf8')
+    if '\r' in content:
+        content = content.replace('\r\n', '\n').replace('\r', '\n')
+    return content
+
+
+def _read_attachment(path, max_size):
+    """read an attachment as a note, if it seems to be a text file
+
+    Only the first block be read for detecting binary files, and no more
+    than max_size + 1 bytes be read even if the file grow after listed.
+
+    return: the text, or None if it is not a UTF-8 text file or larger
+            than max_size (bytes)
+    """
+    try:
+        with open(str(path), mode='rb') as f:
+            data = f.read(min(_BINARY_CHECK_SIZE, max_size + 1))
+            if len(data) > max_size or b'\0' in data:
+                return None
+            try:
+                # a multi-byte char may be cut at the end of the block
+                codecs.getincrementaldecoder('utf8')().decode(data)
+            except UnicodeDecodeError:
+                return None
+            data += f.read(max_size + 1 - len(data))
+        if len(data) > max_size:
+            return None
+        text = str(data, 'utf8')
+    except (OSError, UnicodeDecodeError):
+        return None
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+
+# all a note need for scoring, the content & matches need not be kept.
+# first_offset is where the snippet of the note be taken (None if only
+# the title be matched).
+_Counts = collections.namedtuple('_Counts', [
+    'title_count', 'content_count', 'content_matched_length',
+    'content_length', 'first_offset'])
+
+
+def _get_counts(path, content, matcher):
+    """
+    return: a _Counts, or None if not all patterns be matched
+    """
+    title_counts = matcher.count_all(path.stem)
+    content_counts = matcher.count_all(content)
+
+    hit = all([title_count or content_count
+              for (title_count, _), (content_count, _)
+              in zip(title_counts, content_counts)])
+    if hit:
+        return _sum_counts(title_counts, content_counts, content, matcher)
+
+
+def _sum_counts(title_counts, content_counts, content, matcher):
+    """return: a _Counts of all patterns"""
+    return _Counts(
+        title_count=sum(count for count, _ in title_counts),
+        content_count=sum(count for count, _ in content_counts),
+        content_matched_length=sum(
+            length for _, length in content_counts),
+        content_length=len(content),
+        first_offset=(matcher.find_first(content)
+                      if any(count for count, _ in content_counts)
+                      else None))
+
+
+def _calculate_score(counts):
+    title_score = counts.title_count
+    # a note may be matched by title only and be empty
+    content_score = (counts.content_matched_length / counts.content_length
+                     if counts.content_length else 0)
+    repeat_score = counts.content_count * content_score
+    total_score = title_score + content_score + repeat_score
+    return total_score
+
+
+def _highlight(text, patterns):
+    spans = sorted((m.start(), m.end())
+                   for prog in _compile(patterns)
+                   for m in prog.finditer(text)
+                   if m.end() > m.start())
+    parts = []
+    pos = 0
+    for start, end in spans:
+        start = max(start, pos)  # matches of several patterns may overlap
+        if start < end:
+            parts.append(text[pos:start])
+            parts.append(TC.colored(
+                text[start:end], 'red', attrs=['bold']))
+            pos = end
+    parts.append(text[pos:])
+    return ''.join(parts)
+
+
+def _get_snippet(path, offset, patterns, width=_SNIPPET_WIDTH, budget=None):
+    """take the line around offset of a note, and highlight the matches
+
+    budget = a _Budget limiting the highlighting, which runs user regexes
+
+    return: a str, or '' if the note has no matched content
+    """
+    if offset is None:
+        return ''
+    try:
+        # universal newlines, the same as the offsets come from
+        with open(str(path), encoding='utf8') as f:
+            content = f.read()
+    except (OSError, UnicodeDecodeError):
+        return ''
+    if offset >= len(content):
+        # matched in the attachments
+        return ''
+    start = content.rfind('\n', 0, offset) + 1
+    end = content.find('\n', offset)
+    if end < 0:
+        end = len(content)
+    start = max(start, offset - width // 3)
+    end = min(end, start + width)
+    snippet = ' '.join(content[start:end].split())
+    if sys.platform.startswith('win'):
+        return snippet
+    if budget is None:
+        budget = _Budget()
+    try:
+        return budget.run(_highlight, snippet, patterns)
+    except (_FileTimeout, _QueryTimeout):
+        return snippet
+
+
+class _FileTimeout(Exception):
+    """matching a note takes too long"""
+
+
+class _QueryTimeout(Exception):
+    """matching all notes takes too long"""
+
+
+class _Budget():
+    """Limit the time of matching each note and the whole query.
+
+    A running match is interrupted by SIGALRM, which only work on Unix
+    and in the main thread. Elsewhere the query deadline is still checked
+    between notes.
+
+    file_timeout = seconds for matching a note, 0 = no limit
+    deadline     = time.time() the query should be stopped, None = no limit
+    """
+    def __init__(self, file_timeout=0, deadline=None):
+        self.file_timeout = file_timeout
+        self.deadline = deadline
+
+    def check(self):
+        """raise: _QueryTimeout"""
+        if self.deadline is not None and time.time() >= self.deadline:
+            raise _QueryTimeout()
+
+    def run(self, func, *args):
+        """return: func(*args)
+        raise: _FileTimeout or _QueryTimeout
+        """
+        self.check()
+        limit = self.file_timeout
+        if self.deadline is not None:
+            remain = self.deadline - time.time()
+            limit = min(limit, remain) if limit else remain
+        if (not limit or not hasattr(signal, 'setitimer') or
+                threading.current_thread() is not threading.main_thread()):
+            return func(*args)
+
+        def on_alarm(signum, frame):
+            raise _FileTimeout()
+
+        old_handler = signal.signal(signal.SIGALRM, on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, limit)
+        try:
+            return func(*args)
+        except _FileTimeout:
+            self.check()
+            raise
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, old_handler)
+
+
+def _score_chunk(paths, patterns, file_timeout=0, deadline=None,
+                 attachments=None):
+    """run in worker process
+
+    return: (scores, skipped_paths, timed_out), scores is a list of
+            (path, score, first_offset) of matched notes, and
+            (path, None, None) of the notes which take too long
+    """
+    matcher = _Matcher(patterns)
+    budget = _Budget(file_timeout, deadline)
+    scores = []
+    skipped_paths = []
+    try:
+        for path in paths:
+            budget.check()
+            path, content = _read_hit(path, matcher, attachments)
+            if content is None:
+                continue
+            try:
+                counts = budget.run(_get_counts, path, content, matcher)
+            except _FileTimeout:
+                skipped_paths.append(path)
+                scores.append((path, None, None))
+                continue
+            if counts:
+                scores.append(
+                    (path, _calculate_score(counts), counts.first_offset))
+    except _QueryTimeout:
+        return scores, skipped_paths, True
+    return scores, skipped_paths, False
+
+
+def _hit_chunk(paths, patterns, file_timeout=0, deadline=None,
+               attachments=None):
+    """run in worker process
+
+    return: (hits, skipped_paths, timed_out), hits is a list of matched
+            notes
+    """
+    matcher = _Matcher(patterns)
+    budget = _Budget(file_timeout, deadline)
+    hits = []
+    skipped_paths = []
+    try:
+        for path in paths:
+            budget.check()
+            path, content = _read_hit(path, matcher, attachments)
+            if content is None:
+                continue
+            try:
+                if budget.run(matcher.is_hit, path.stem, content):
+                    hits.append(path)
+            except _FileTimeout:
+                skipped_paths.append(path)
+    except _QueryTimeout:
+        return hits, skipped_paths, True
+    return hits, skipped_paths, False
+
+
+def _non_negative_int(value):
+    """the argparse type of -j/--jobs"""
+    try:
+        number = int(value)
+    except ValueError:
+        number = -1
+    if number < 0:
+        raise argparse.ArgumentTypeError(
+            '"{}" is not a non-negative integer'.format(value))
+    return number
+
+
 class FindCommand(command.Command):
     def get_name(self):
         return 'find'
@@ -43,53 +487,170 @@ class FindCommand(command.Command):
             description='find some notes which contain some special patterns')
 
         parser.add_argument(
-            'patterns', metavar='PATTERN', type=str, nargs='+',
+            'patterns', metavar='PATTERN', type=str, nargs='*',
             help='string or regex patterns for finding')
 
+        parser.add_argument(
+            '-q', '--query', dest='query', metavar='QUERY', type=str,
+            help=('find by a boolean query, e.g.,\n'
+                  '  \'(foo OR "bar baz") NOT title:qux mtime>30d\'\n'
+                  'operators: AND (or just a space), OR, NOT, ( )\n'
+                  'fields: title:, path:, category:, content:,\n'
+                  '  mtime<, mtime>, size<, size>, ... (<=, >=, =)\n'
+                  '  (time: 2020-01-31, 7d, 12h, 2w; size: 500, 10k, 1m)\n'
+                  'a note is read only if the other terms cannot decide\n'
+                  '(PATTERNs, if any, should be all matched too)'))
+
         parser.add_argument(
             '-p', '--path-patterns', dest="path_patterns", metavar='PATTERN',
             type=str, nargs='*',
             help=('filter patterns should match on pathname of notes\n'
                   '(not include parents of project\'s root)'))
 
+        parser.add_argument(
+            '-j', '--jobs', dest='jobs', metavar='N', type=_non_negative_int,
+            help=('how many processes can be used to match the notes\n'
+                  '(0 = number of CPUs, default: "find:jobs" setting)'))
+
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument(
+            '--title-only', dest='scope', action='store_const',
+            const='title', default='all',
+            help='only match & rank on the titles, never read notes')
+        group.add_argument(
+            '--path-only', dest='scope', action='store_const',
+            const='path', default='all',
+            help=('only match & rank on the pathnames (based on project\n'
+                  'root dir), never read notes'))
+        group.add_argument(
+            '--attachments', dest='scope', action='store_const',
+            const='attachments', default='all',
+            help=('also match the text files beside the resourced notes,\n'
+                  'as parts of their notes (the files larger than\n'
+                  '"find:attachment_max_size" setting are skipped)'))
+
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument(
+            '-l', '--files-only', dest='files_only', action='store_true',
+            help=('print the matched notes (path based on project root\n'
+                  'dir) without ranking, instead of open a selector'))
+        group.add_argument(
+            '-c', '--count', dest='count', action='store_true',
+            help='print how many notes be matched')
+        group.add_argument(
+            '--json', dest='output', action='store_const', const='json',
+            help=('print a JSON record for each matched note without\n'
+                  'ranking (path, mtime, title, rmd, score)'))
+        group.add_argument(
+            '--plain', dest='output', action='store_const', const='plain',
+            help='like --json, but print tab-separated values')
+
+        parser.add_argument(
+            '--limit', dest='limit', metavar='N', type=int,
+            help='stop after N notes be printed (with -l, --json, --plain)')
+
+        self.parser = parser
+
     def run(self, args):
         def start_find_selector():
-            note_items = [NS.note_item_factory(
-                path=data[0],
-                rootdir=self.rootdir,
-                text_format=self.config['selector']['find_format'],
-                default_editor=self.config['selector']['editor'],
-                default_file_browser=self.config['selector']['file_browser'],
-                config=self.config,
-                )
-                for data in sorted(
-                    self.get_all_matches(args.patterns, args.path_patterns),
-                    key=lambda data: self.calculate_score(*data),
-                    reverse=True)]
+            # the highlighting of snippets runs user regexes as well
+            snippet_budget = _Budget(
+                float(self.config['find']['file_timeout']))
+
+            def note_item_factory(data):
+                path, _, first_offset = data
+
+                def get_extra_properties(noteinfo):
+                    # only be called when the item be shown
+                    return {'snippet': _get_snippet(
+                        path, first_offset, highlight_patterns,
+                        budget=snippet_budget)}
+
+                return NS.note_item_factory(
+                    path=data[0],
+                    rootdir=self.rootdir,
+                    text_format=self.config['selector']['find_format'],
+                    default_editor=self.config['selector']['editor'],
+                    default_file_browser=(
+                        self.config['selector']['file_browser']),
+                    config=self.config,
+                    project_tree=self.get_project_tree(),
+                    get_extra_properties=get_extra_properties,
+                    )
+
+            note_items = IS.LazyItems(
+                IS.RankedDatas(list(get_scores()), key=lambda data: data[1]),
+                note_item_factory)
             if len(note_items) > 0:
                 NS.start_note_selector(note_items, self.config)
 
+        def print_hits():
+            if query is not None:
+                paths = (path for path, _, _ in self.iter_query_scores(
+                    query, args.path_patterns, rank=False))
+            else:
+                paths = self.get_all_hits(
+                    args.patterns, args.path_patterns,
+                    self.get_jobs(args.jobs), args.scope)
+            if args.count:
+                print(sum(1 for path in paths))
+                return
+            try:
+                for path in itertools.islice(paths, args.limit):
+                    print(str(path.relative_to(self.rootdir)), flush=True)
+            except BrokenPipeError:
+                devnull = os.open(os.devnull, os.O_WRONLY)
+                os.dup2(devnull, sys.stdout.fileno())
+
+        def print_records():
+            tree = self.get_project_tree()
+            NS.print_records(
+                ((NS.NoteInfo(path, self.rootdir, project_tree=tree),
+                  {'score': score})
+                 for path, score, _ in get_scores()),
+                args.output, args.limit)
+
+        def get_scores():
+            if query is not None:
+                return self.iter_query_scores(query, args.path_patterns)
+            return self.iter_scores(
+                args.patterns, args.path_patterns,
+                self.get_jobs(args.jobs), args.scope)
+
+        if args.query is not None:
+            if args.scope != 'all':
+                self.parser.error(
+                    '--query cannot be used with --title-only, --path-only'
+                    ' or --attachments')
+            try:
+                query = findquery.parse(args.query, args.patterns)
+            except findquery.QueryError as e:
+                self.parser.error('bad query: {}'.format(e))
+            highlight_patterns = query.get_patterns()
+        elif not args.patterns:
+            self.parser.error('PATTERN or --query is required')
+        else:
+            query = None
+            highlight_patterns = args.patterns
+
         self.require_rootdir()
-        start_find_selector()
+        if args.files_only or args.count:
+            print_hits()
+        elif args.output:
+            print_records()
+        else:
+            start_find_selector()
 
-    def get_all_matches(self, patterns, path_patterns):
-        """
-        yield: (path, content, title_matches_list, content_matches_list)
-        """
-        def get_matches(path, progs):
-            title_matches_list = [
-                tuple(m for m in prog.finditer(path.stem))
-                for prog in progs]
-            with open(str(path), encoding='utf8') as f:
-                content = f.read()
-            content_matches_list = [
-                tuple(m for m in prog.finditer(content))
-                for prog in progs]
-            return content, title_matches_list, content_matches_list
-
-        progs = [re.compile(pattern, re.IGNORECASE)
-                 for pattern in patterns]
+    def get_jobs(self, jobs=None):
+        """how many processes can be used to match the notes"""
+        if jobs is None:
+            jobs = int(self.config['find']['jobs'])
+        if jobs <= 0:
+            jobs = os.cpu_count() or 1
+        return jobs
 
+    def get_candidate_paths(self, patterns, path_patterns, use_index=True):
+        """return: a list of notes which need to be matched"""
         if path_patterns:
             path_progs = [re.compile(path_pattern, re.IGNORECASE)
                           for path_pattern in path_patterns]
@@ -102,43 +663,303 @@ class FindCommand(command.Command):
         else:
             all_md_paths = self.get_all_md_paths()
 
-        for path in all_md_paths:
-            (content,
-             title_matches_list,
-             content_matches_list) = get_matches(path, progs)
-
-            hit = all([any((title_matches, content_matches))
-                      for title_matches, content_matches
-                      in zip(title_matches_list, content_matches_list)])
-            if hit:
-                yield (path, content,
-                       title_matches_list, content_matches_list)
-
-    def calculate_score(self, path, content,
-                        title_matches_list, content_matches_list):
-        def get_title_score(title, title_matches_list):
-            # title_matches_len = 0
-            # for title_matches in title_matches_list:
-            #     title_matches_len += len(
-            #         ''.join(m.group(0) for m in title_matches))
-            # return title_matches_len / len(title)
-            return sum(len(tms) for tms in title_matches_list)
-
-        def get_content_score(content, content_matches_list):
-            content_matches_len = 0
-            for content_matches in content_matches_list:
-                content_matches_len += len(
-                    ''.join(m.group(0) for m in content_matches))
-            return content_matches_len / len(content)
-
-        def get_repeat_score(content_score, content_matches_list):
-            repeat_count = 0
-            for content_matches in content_matches_list:
-                repeat_count += len(content_matches)
-            return repeat_count * content_score
-
-        title_score = get_title_score(path.stem, title_matches_list)
-        content_score = get_content_score(content, content_matches_list)
-        repeat_score = get_repeat_score(content_score, content_matches_list)
-        total_score = title_score + content_score + repeat_score
-        return total_score
+        if use_index and self.config['find'].getboolean('index'):
+            candidates = findindex.TrigramIndex(
+                self.rootdir, self.get_scan_workers()).get_candidates(
+                    self.get_project_tree(), patterns)
+            if candidates is not None:
+                all_md_paths = (path for path in all_md_paths
+                                if path in candidates)
+
+        return list(all_md_paths)
+
+    def __map_chunks(self, func, paths, patterns, jobs, budget,
+                     attachments=None):
+        """run func(chunk_of_paths, patterns, file_timeout, deadline,
+        attachments_of_chunk) in `jobs` processes
+
+        yield: every item of returned lists, in order
+        raise: OSError or NotImplementedError if no working multiprocessing
+               _QueryTimeout if the budget of query is run out
+        """
+        def get_items(future):
+            items, skipped_paths, timed_out = future.result()
+            for path in skipped_paths:
+                self.__report_file_timeout(path, budget)
+            yield from items
+            if timed_out:
+                raise _QueryTimeout()
+
+        chunk_size = min(max(len(paths) // (jobs * 4), 1), 256)
+        chunks = [paths[i:i + chunk_size]
+                  for i in range(0, len(paths), chunk_size)]
+        with concurrent.futures.ProcessPoolExecutor(
+                min(jobs, len(chunks)) or 1) as executor:
+            # only submit a few chunks ahead, so a consumer which stop
+            # early will not wait for the whole project be matched.
+            futures = collections.deque()
+            for chunk in chunks:
+                futures.append(executor.submit(
+                    func, chunk, patterns,
+                    budget.file_timeout, budget.deadline,
+                    {path: attachments[path] for path in chunk
+                     if path in attachments} if attachments else None))
+                if len(futures) >= jobs * 2:
+                    yield from get_items(futures.popleft())
+            while futures:
+                yield from get_items(futures.popleft())
+
+    def __get_paths_to_match(self, patterns, path_patterns, scope):
+        """return: (paths, attachments), see get_attachments()"""
+        if scope == 'attachments':
+            # the index know nothing about attachments
+            paths = self.get_candidate_paths(
+                patterns, path_patterns, use_index=False)
+            return paths, self.get_attachments(paths)
+        return self.get_candidate_paths(patterns, path_patterns), None
+
+    def get_attachments(self, paths):
+        """find the text-like attachments of the resourced notes in paths,
+        which are not ignored and not larger than "find:attachment_max_size"
+
+        return: {path: [(attachment_path, max_size), ...]}, max_size is
+                checked again when reading, the files may grow
+        """
+        tree = self.get_project_tree()
+        ignore_patterns = self.config['project']['ignore_patterns']
+        max_size = int(self.config['find']['attachment_max_size']) * 1024
+
+        def list_attachments(path):
+            attachment_paths = []
+            for attachment_path in sorted(utils.filted_ignore(
+                    utils.get_resource_paths(path),
+                    self.rootdir, ignore_patterns)):
+                try:
+                    if attachment_path.stat().st_size <= max_size:
+                        attachment_paths.append((attachment_path, max_size))
+                except OSError:
+                    pass
+            return path, attachment_paths
+
+        return dict(utils.concurrent_map(
+            list_attachments,
+            [path for path in paths if tree.is_rmd(path)],
+            self.get_scan_workers()))
+
+    def get_name_scores(self, patterns, path_patterns, scope):
+        """match & rank on titles (scope = 'title') or pathnames (scope =
+        'path') only, no note will be read
+
+        return: a list of (path, score, None)
+        """
+        if scope == 'title':
+            def get_name(path):
+                return path.stem
+        else:
+            def get_name(path):
+                return str(path.relative_to(self.rootdir))
+
+        matcher = _Matcher(patterns)
+        budget = self.get_budget()
+        scores = []
+        try:
+            for path in self.get_candidate_paths(
+                    patterns, path_patterns, use_index=False):
+                try:
+                    counts = budget.run(matcher.count_all, get_name(path))
+                except _FileTimeout:
+                    self.__report_file_timeout(path, budget)
+                    continue
+                if all(count for count, _ in counts):
+                    scores.append(
+                        (path, sum(count for count, _ in counts), None))
+        except _QueryTimeout:
+            self.__report_query_timeout()
+        return scores
+
+    def get_all_hits(self, patterns, path_patterns, jobs=1, scope='all'):
+        """find the matched notes without counting all matches
+
+        yield: path
+        """
+        if scope in ('title', 'path'):
+            for path, _, _ in self.get_name_scores(
+                    patterns, path_patterns, scope):
+                yield path
+            return
+
+        paths, attachments = self.__get_paths_to_match(
+            patterns, path_patterns, scope)
+        if scope == 'all' and self.config['find'].getboolean('cache'):
+            # only use a fully cached query, never count all matches here
+            scores = findcache.QueryCache(self.rootdir).get_cached_scores(
+                patterns, path_patterns, paths, self.get_project_tree())
+            if scores is not None:
+                for path, _, _ in scores:
+                    yield path
+                return
+
+        budget = self.get_budget()
+        try:
+            yield from self.__hit_paths(
+                paths, patterns, jobs, budget, attachments)
+        except _QueryTimeout:
+            self.__report_query_timeout()
+
+    def __hit_paths(self, paths, patterns, jobs, budget, attachments=None):
+        """yield: the matched notes in paths, in order"""
+        if jobs > 1:
+            started = False
+            try:
+                for path in self.__map_chunks(
+                        _hit_chunk, paths, patterns, jobs, budget,
+                        attachments):
+                    started = True
+                    yield path
+                return
+            except (OSError, NotImplementedError):
+                # no working multiprocessing in this platform
+                if started:
+                    raise
+
+        matcher = _Matcher(patterns)
+        read = functools.partial(
+            _read_hit, matcher=matcher, attachments=attachments)
+        for path, content in utils.concurrent_map(
+                read, paths, self.get_scan_workers()):
+            budget.check()
+            if content is None:
+                continue
+            try:
+                if budget.run(matcher.is_hit, path.stem, content):
+                    yield path
+            except _FileTimeout:
+                self.__report_file_timeout(path, budget)
+
+    def iter_scores(self, patterns, path_patterns, jobs=1, scope='all'):
+        """match the notes in `jobs` processes, in the order of
+        get_candidate_paths()
+
+        yield: (path, score, first_offset), first_offset is where the
+               snippet be taken
+        """
+        if scope in ('title', 'path'):
+            yield from self.get_name_scores(patterns, path_patterns, scope)
+            return
+
+        paths, attachments = self.__get_paths_to_match(
+            patterns, path_patterns, scope)
+        budget = self.get_budget()
+        try:
+            if scope == 'all' and self.config['find'].getboolean('cache'):
+                yield from findcache.QueryCache(self.rootdir).iter_scores(
+                    patterns, path_patterns, paths, self.get_project_tree(),
+                    lambda paths: self.__score_paths(
+                        paths, patterns, jobs, budget))
+            else:
+                for data in self.__score_paths(
+                        paths, patterns, jobs, budget, attachments):
+                    if data[1] is not None:
+                        yield data
+        except _QueryTimeout:
+            # the cache will not be saved either
+            self.__report_query_timeout()
+
+    def __score_paths(self, paths, patterns, jobs, budget, attachments=None):
+        """yield: (path, score, first_offset) of the matched notes in paths,
+        in order, and (path, None, None) of the notes which take too long
+        """
+        if jobs > 1:
+            started = False
+            try:
+                for data in self.__map_chunks(
+                        _score_chunk, paths, patterns, jobs, budget,
+                        attachments):
+                    started = True
+                    yield data
+                return
+            except (OSError, NotImplementedError):
+                # no working multiprocessing in this platform
+                if started:
+                    raise
+
+        matcher = _Matcher(patterns)
+        read = functools.partial(
+            _read_hit, matcher=matcher, attachments=attachments)
+        for path, content in utils.concurrent_map(
+                read, paths, self.get_scan_workers()):
+            budget.check()
+            if content is None:
+                continue
+            try:
+                counts = budget.run(_get_counts, path, content, matcher)
+            except _FileTimeout:
+                self.__report_file_timeout(path, budget)
+                yield path, None, None
+                continue
+            if counts:
+                yield path, self.calculate_score(counts), counts.first_offset
+
+    def iter_query_scores(self, query, path_patterns, rank=True):
+        """match the notes by a parsed findquery, a note be read only if
+        the query cannot be decided by pathname, title & stat
+
+        rank = False to skip ranking, every score will be 0
+
+        yield: (path, score, first_offset), see iter_scores()
+        """
+        tree = self.get_project_tree()
+        patterns = query.get_patterns() if rank else []
+        matcher = _Matcher(patterns) if patterns else None
+
+        def evaluate(path):
+            note = findquery.QueryNote(path, self.rootdir, tree, _read_content)
+            if not query.evaluate(note):
+                return None
+            if matcher is None:
+                return path, 0, None
+            counts = _sum_counts(
+                matcher.count_all(note.title),
+                matcher.count_all(note.content),
+                note.content, matcher)
+            return path, self.calculate_score(counts), counts.first_offset
+
+        def evaluate_in_budget(path):
+            try:
+                return budget.run(evaluate, path)
+            except _FileTimeout:
+                self.__report_file_timeout(path, budget)
+
+        budget = self.get_budget()
+        try:
+            for data in utils.concurrent_map(
+                    evaluate_in_budget,
+                    self.get_candidate_paths(
+                        [], path_patterns, use_index=False),
+                    self.get_scan_workers()):
+                if data is not None:
+                    yield data
+        except _QueryTimeout:
+            self.__report_query_timeout()
+
+    def get_budget(self):
+        """return: a _Budget of matching, by the settings of "find"
+        section"""
+        file_timeout = float(self.config['find']['file_timeout'])
+        query_timeout = float(self.config['find']['query_timeout'])
+        return _Budget(
+            file_timeout,
+            time.time() + query_timeout if query_timeout > 0 else None)
+
+    def __report_file_timeout(self, path, budget):
+        print('[timeout] skip "{}": matching takes over {} seconds.'.format(
+            path.relative_to(self.rootdir), budget.file_timeout),
+            file=sys.stderr)
+
+    def __report_query_timeout(self):
+        print('[timeout] stop finding after {} seconds, the results are'
+              ' incomplete.'.format(self.config['find']['query_timeout']),
+              file=sys.stderr)
+
+    def calculate_score(self, counts):
+        return _calculate_score(counts)
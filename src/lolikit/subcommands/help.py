@@ -169,12 +169,63 @@ class HelpCommand(command.Command):
             Determine which path will be ignore by lolikit in current project.
             It is a list of regex patterns and splitted by newline.
 
+            If a directory be ignored, all things under it will be ignored
+            too and lolikit will never look into it.
+
+            A pattern starts with "glob:" is a glob pattern. In glob pattern,
+            "*" and "?" never match the path separator, "**" match anything.
+            If a glob pattern not contain "/", it can match a filename in
+            any directory level.
+
+            example:
+                ^build$
+                glob:*.swp
+                glob:vendor/**/cache
+
             PS: The "^.loli" pattern will be appended automatically and cannot
             be removed.
 
             (default: {default[project][ignore_patterns]})
 
 
+
+            #### catalog ####
+
+            Keep a note catalog in ".loli/lolikit/catalog.sqlite" to speed
+            up the scanning of project. A directory will not be listed
+            again if its modified time not changed since last time, and
+            the size & modified time of its notes are taken from the
+            catalog too. So a note edited in place (which not change the
+            modified time of its directory) may be listed with its old
+            modified time, until something be added, removed or renamed in
+            the same directory. (`loli find` always check the notes.)
+
+            The catalog can be shared by several lolikit processes (e.g., a
+            `loli serve` and a cron'd `loli check`). If other process is
+            updating it, lolikit will not wait, just scan the project by
+            itself this time.
+
+            On a network file system (NFS, SMB, sshfs ...), the catalog
+            cannot use the WAL journal of SQLite, so the processes may wait
+            each other for a few seconds.
+
+            You may want to turn it off if the project folder is read-only.
+            (Lolikit will scan the whole project every time.)
+
+            (default: {default[project][catalog]})
+
+
+
+            #### scan_workers ####
+
+            How many threads can be used to scan directories and read notes
+            at the same time. Set it larger than 1 (e.g., 16) can make
+            lolikit much faster if your project is on a high latency file
+            system, like NFS or sshfs. The results are always the same.
+
+            (default: {default[project][scan_workers]})
+
+
             -----------------------------------------------------------------
 
 
@@ -272,6 +323,11 @@ class HelpCommand(command.Command):
             >   - {{prepend_resourced_icon}}
             >   - {{append_resourced_icon}}
             >   - {{category}}
+            >
+            > Following variables can be used in find_format only:
+            >
+            >   - {{snippet}}: the line around the first match, only be
+            >     read when the note be shown on the page.
 
             -----------------------------------------------------------------
 
@@ -312,6 +368,87 @@ class HelpCommand(command.Command):
             -----------------------------------------------------------------
 
 
+            ### [find] section ###
+
+            Control "find" command behavior.
+
+
+
+            #### index ####
+
+            Keep a trigram index of note titles & contents in
+            ".loli/lolikit/findindex.sqlite", so "find" only need to read
+            the notes which may match the patterns. Changed notes will be
+            re-indexed automatically.
+
+            It work well with CJK text. A pattern without any literal string
+            longer than 2 chars (e.g., "a.c") cannot use the index, and
+            the index cannot help on the case-insensitive letters "i", "k",
+            "s" and non-ASCII letters.
+
+            The index may be several times larger than your notes.
+
+            (default: {default[find][index]})
+
+
+
+            #### cache ####
+
+            Keep the results of recent finding in
+            ".loli/lolikit/findcache.sqlite". Find the same patterns again
+            will only match the notes which be added or changed since last
+            time, and return instantly if nothing changed.
+
+            (default: {default[find][cache]})
+
+
+
+            #### jobs ####
+
+            How many processes can be used to match the notes at the same
+            time. "0" means the number of CPUs. It can be overridden by
+            "loli find -j N". The results are always the same.
+
+            (default: {default[find][jobs]})
+
+
+
+            #### attachment_max_size ####
+
+            KB. "loli find --attachments" also matches the attachments
+            (other files beside the resourced notes) which are UTF-8 text
+            files and not larger than this size. Binary files are detected
+            by their first 8 KB and skipped.
+
+            (default: {default[find][attachment_max_size]})
+
+
+
+            #### file_timeout ####
+
+            Seconds. If matching a note takes longer (e.g., a regex with
+            catastrophic backtracking on a huge note), skip the note and
+            report it. "0" means no limit.
+
+            It only works on Unix, and only when "find" matches notes in
+            the main thread ("project:scan_workers" = 1) or in processes
+            ("find:jobs" > 1).
+
+            (default: {default[find][file_timeout]})
+
+
+
+            #### query_timeout ####
+
+            Seconds. If finding takes longer, stop it and show the notes
+            which already be matched. "0" means no limit.
+
+            (default: {default[find][query_timeout]})
+
+
+            -----------------------------------------------------------------
+
+
             ### [serve] section ###
 
             Control lolinote server behavior.
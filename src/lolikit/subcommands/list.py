@@ -25,6 +25,7 @@
 
 
 import argparse
+import heapq
 import re
 import subprocess
 
@@ -50,22 +51,67 @@ class ListCommand(command.Command):
             '-d', '--dir', dest='dir', action='store_true',
             help='show directories recently be used')
 
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument(
+            '--json', dest='output', action='store_const', const='json',
+            help=('print a JSON record for each note (or directory)\n'
+                  'instead of open a selector'))
+        group.add_argument(
+            '--plain', dest='output', action='store_const', const='plain',
+            help='like --json, but print tab-separated values')
+
+        parser.add_argument(
+            '--limit', dest='limit', metavar='N', type=int,
+            help='only list the N most recently changed notes (or dirs)')
+
+        parser.add_argument(
+            '--since', dest='since', metavar='TIME', type=utils.parse_time,
+            help=('only list the notes (or dirs) changed after TIME\n'
+                  '(e.g., 2020-01-31, 2020-01-31T08:30, 12h, 7d, 2w)'))
+
+        parser.add_argument(
+            '--until', dest='until', metavar='TIME', type=utils.parse_time,
+            help='only list the notes (or dirs) changed before TIME')
+
     def run(self, args):
+        def get_recent_datas(paths):
+            """
+            return: a sequence of (path, mtime) sorted by mtime (new to old),
+                    only the first pages be sorted when be used
+            """
+            tree = self.get_project_tree()
+            datas = [(path, tree.get_stat(path).st_mtime) for path in paths]
+            if args.since is not None:
+                datas = [data for data in datas if data[1] >= args.since]
+            if args.until is not None:
+                datas = [data for data in datas if data[1] < args.until]
+            if args.limit is not None:
+                # same as sorted(..., reverse=True)[:limit], ties keep order
+                return heapq.nlargest(
+                    max(args.limit, 0), datas, key=lambda data: data[1])
+            return IS.RankedDatas(datas, key=lambda data: data[1])
+
         def start_note_selector():
-            note_items = [NS.note_item_factory(
-                path,
-                rootdir=self.rootdir,
-                text_format=self.config['selector']['list_format'],
-                default_editor=self.config['selector']['editor'],
-                default_file_browser=self.config['selector']['file_browser'],
-                config=self.config,
-                )
-                for path in sorted(self.get_all_md_paths(),
-                                   key=lambda x: x.stat().st_mtime,
-                                   reverse=True)]
+            tree = self.get_project_tree()
+
+            def note_item_factory(data):
+                return NS.note_item_factory(
+                    data[0],
+                    rootdir=self.rootdir,
+                    text_format=self.config['selector']['list_format'],
+                    default_editor=self.config['selector']['editor'],
+                    default_file_browser=(
+                        self.config['selector']['file_browser']),
+                    config=self.config,
+                    project_tree=tree,
+                    )
+
+            note_items = IS.LazyItems(
+                get_recent_datas(tree.md_paths), note_item_factory)
             NS.start_note_selector(note_items, self.config)
 
         def start_dir_selector():
+            tree = self.get_project_tree()
             usage = (
                 '\n'
                 'How to use\n'
@@ -105,12 +151,12 @@ class ListCommand(command.Command):
 
                 return IS.Item(text=text_func,
                                task=task,
-                               data=NS.PathInfo(dir_path, self.rootdir))
+                               data=NS.PathInfo(dir_path, self.rootdir,
+                                                tree.get_stat(dir_path)))
 
-            items = [directory_item_factory(dir_path) for dir_path
-                     in sorted(self.get_all_dir_paths(),
-                               key=lambda p: p.stat().st_mtime,
-                               reverse=True)]
+            items = IS.LazyItems(
+                get_recent_datas(tree.dir_paths),
+                lambda data: directory_item_factory(data[0]))
 
             return IS.start_selector(
                 items,
@@ -120,8 +166,20 @@ class ListCommand(command.Command):
                 page_size=int(self.config['selector'].get('page_size')),
                 reverse=self.config['selector'].getboolean('reverse'))
 
+        def print_records():
+            tree = self.get_project_tree()
+            if args.dir:
+                infos = (NS.PathInfo(path, self.rootdir, tree.get_stat(path))
+                         for path, _ in get_recent_datas(tree.dir_paths))
+            else:
+                infos = (NS.NoteInfo(path, self.rootdir, project_tree=tree)
+                         for path, _ in get_recent_datas(tree.md_paths))
+            NS.print_records(((info, {}) for info in infos), args.output)
+
         self.require_rootdir()
-        if args.dir:
+        if args.output:
+            print_records()
+        elif args.dir:
             start_dir_selector()
         else:
             start_note_selector()
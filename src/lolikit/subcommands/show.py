@@ -25,7 +25,6 @@
 
 
 import argparse
-import functools
 
 from .. import command
 
@@ -81,17 +80,12 @@ class ShowCommand(command.Command):
 
     def __get_md_total_size(self):
         """return md total size (bytes)"""
-        return functools.reduce(
-            lambda value, next: value + next.stat().st_size,
-            self.get_all_md_paths(),
-            0)
+        tree = self.get_project_tree()
+        return sum(tree.get_stat(p).st_size for p in tree.md_paths)
 
     def __get_project_total_size(self):
         """return project total size (bytes)"""
-        return functools.reduce(
-            lambda value, next: value + next.stat().st_size,
-            (p for p in self.rootdir.rglob('*')),
-            0)
+        return self.get_project_tree().total_size
 
     def __get_md_avg_depth(self):
         path_depths = [len(p.relative_to(self.rootdir).parents)
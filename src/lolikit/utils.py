@@ -24,8 +24,12 @@
 ##########################################################################
 
 
+import collections
+import concurrent.futures
 import configparser
+import datetime as DT
 import pathlib
+import threading
 import sys
 import os
 import signal
@@ -33,6 +37,7 @@ import os.path
 import functools
 import shlex
 import re
+import time
 
 from . import defaultconfig
 
@@ -119,29 +124,136 @@ def get_default_opener():
         return 'cmd /c \'{path}\''
 
 
-@functools.lru_cache(maxsize=None)
+CacheInfo = collections.namedtuple(
+    'CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class DirMtimeCache():
+    """A size bounded LRU cache for results depend on a directory.
+
+    Every entry remembers the mtime of its directory, and will be
+    recomputed when the mtime be changed.
+    """
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__data = collections.OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key, dir_path, compute):
+        """return the cached value of key, or compute() a new one"""
+        try:
+            mtime = os.stat(str(dir_path)).st_mtime_ns
+        except OSError:
+            mtime = None
+        with self.__lock:
+            item = self.__data.get(key)
+            if item is not None and item[0] == mtime:
+                self.__data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            self.misses += 1
+
+        value = compute()
+        with self.__lock:
+            self.__data[key] = (mtime, value)
+            self.__data.move_to_end(key)
+            while len(self.__data) > self.maxsize:
+                self.__data.popitem(last=False)
+        return value
+
+    def cache_info(self):
+        return CacheInfo(self.hits, self.misses,
+                         self.maxsize, len(self.__data))
+
+    def cache_clear(self):
+        with self.__lock:
+            self.__data.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+def dir_mtime_cache(get_dir_path, maxsize=4096):
+    """a decorator like functools.lru_cache, but use DirMtimeCache
+
+    get_dir_path = a function accept the same arguments as the decorated
+                   function and return the directory it depends on.
+    """
+    def decorator(func):
+        cache = DirMtimeCache(maxsize)
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            return cache.get(
+                args, get_dir_path(*args), lambda: func(*args))
+
+        wrapper.cache_info = cache.cache_info
+        wrapper.cache_clear = cache.cache_clear
+        return wrapper
+    return decorator
+
+
+def _has_other_md(path, rootdir, ignore_patterns):
+    """any other not ignored .md in the subtree of path's parent?"""
+    matcher = get_ignore_matcher(ignore_patterns)
+    for dirpath, dirnames, filenames in os.walk(str(path.parent)):
+        relpath = os.path.relpath(dirpath, str(rootdir))
+        prefix = '' if relpath == '.' else relpath + os.sep
+        dirnames[:] = [name for name in dirnames
+                       if not matcher.match(prefix + name)]
+        for name in filenames:
+            if (os.path.normcase(name).endswith('.md') and
+                    os.path.join(dirpath, name) != str(path) and
+                    not matcher.match(prefix + name)):
+                return True
+    return False
+
+
+@dir_mtime_cache(lambda path, rootdir, ignore_patterns: path.parent)
 def is_rmd(path, rootdir, ignore_patterns):
-    """test the path is a resourced md path or not"""
-    if all((
-        path.is_file(),
-        path.match('*.md'),
-        all(False for p2 in path.parent.rglob('*.md') if p2 != path),
-        any(True for p2
-            in filted_ignore(get_resource_paths(path),
-                             rootdir, ignore_patterns)),
-            )):
-        return True
-    else:
-        return False
+    """test the path is a resourced md path or not
+
+    It stop scanning as soon as a second note be found. Use ProjectTree
+    to classify lots of notes at once.
+
+    The result is cached until the mtime of path's parent be changed.
+    (changes in deeper sub-directories are not noticed.)
+    """
+    return (path.is_file() and
+            path.match('*.md') and
+            len(filted_ignore(get_resource_paths(path),
+                              rootdir, ignore_patterns)) > 0 and
+            not _has_other_md(path, rootdir, ignore_patterns))
 
 
-@functools.lru_cache(maxsize=None)
+@dir_mtime_cache(lambda rmd_path: rmd_path.parent)
 def get_resource_paths(rmd_path):
     """get a list of resource file paths of a resourced md"""
     return [path for path in rmd_path.parent.glob('*')
             if path != rmd_path and path.is_file()]
 
 
+def concurrent_map(func, iterable, workers=1):
+    """like map(), but call func in a thread pool if workers > 1
+
+    The results are yielded in the same order as the iterable. Only a few
+    calls are run ahead, so a slow consumer will not pile up results.
+    """
+    if workers <= 1:
+        yield from map(func, iterable)
+        return
+
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        futures = collections.deque()
+        for item in iterable:
+            futures.append(executor.submit(func, item))
+            if len(futures) >= workers * 4:
+                yield futures.popleft().result()
+        while futures:
+            yield futures.popleft().result()
+
+
 def get_opener_command(opener, path):
     path = str(path)
     if ' ' in opener:
@@ -153,17 +265,144 @@ def get_opener_command(opener, path):
     return command
 
 
+def _glob_to_regex(glob):
+    """translate a glob pattern to a regex pattern for root relative path
+
+    "*", "?" & "[...]" never match a path separator and "**" match
+    anything.
+    A glob without any "/" can match the name in any directory level.
+    """
+    sep = re.escape(os.sep)
+    anchored = '/' in glob.rstrip('/')
+    glob = glob.strip('/')
+    tokens = []
+    i = 0
+    while i < len(glob):
+        c = glob[i]
+        if glob.startswith('**/', i):
+            tokens.append('(.*{})?'.format(sep))
+            i += 3
+            continue
+        elif glob.startswith('**', i):
+            tokens.append('.*')
+            i += 2
+            continue
+        elif c == '*':
+            tokens.append('[^{}]*'.format(sep))
+        elif c == '?':
+            tokens.append('[^{}]'.format(sep))
+        elif c == '/':
+            tokens.append(sep)
+        elif c == '[' and ']' in glob[i + 2:]:
+            end = glob.index(']', i + 2)
+            content = glob[i + 1:end].replace('\\', '\\\\')
+            if content.startswith('!'):
+                content = '^' + content[1:]
+            # like "?", a bracket never match a path separator
+            tokens.append('(?!{})[{}]'.format(sep, content))
+            i = end
+        else:
+            tokens.append(re.escape(c))
+        i += 1
+    body = ''.join(tokens)
+    if anchored:
+        return '^{body}($|{sep})'.format(sep=sep, body=body)
+    else:
+        return '(^|{sep}){body}($|{sep})'.format(sep=sep, body=body)
+
+
+class IgnoreMatcher():
+    """Decide a root relative pathname should be ignored or not.
+
+    All patterns will be combined into one regex if possible. If a
+    directory is ignored, all things under it are ignored too, and the
+    verdicts of directories will be remembered.
+
+    A pattern starts with "glob:" is a glob pattern (e.g., "glob:*.swp").
+    """
+    def __init__(self, ignore_patterns, dir_cache_size=10000):
+        patterns = []
+        for pattern in ignore_patterns.split('\n'):
+            pattern = pattern.strip()
+            if pattern.startswith('glob:'):
+                patterns.append(_glob_to_regex(pattern[5:].strip()))
+            elif pattern:
+                patterns.append(pattern)
+
+        self.__progs = [re.compile(pattern) for pattern in patterns]
+        # backreferences are numbered in the whole regex, and an inline
+        # flag (e.g., "(?i)") in one pattern apply to the whole regex in
+        # python < 3.6, these patterns cannot be combined.
+        if len(patterns) > 1 and not any(
+                re.search(r'\\\d|\(\?P=|\(\?[aiLmsux]', p)
+                for p in patterns):
+            try:
+                self.__progs = [re.compile('|'.join(
+                    '(?:{})'.format(pattern) for pattern in patterns))]
+            except re.error:
+                pass
+
+        self.__dir_cache = {}
+        self.__dir_cache_size = dir_cache_size
+
+    def match(self, pathname):
+        """test the pathname only, without considering its parents"""
+        return any(prog.search(pathname) for prog in self.__progs)
+
+    def __is_ignored_dir(self, dirname):
+        try:
+            return self.__dir_cache[dirname]
+        except KeyError:
+            pass
+        ignored = self.match(dirname)
+        if len(self.__dir_cache) >= self.__dir_cache_size:
+            self.__dir_cache.clear()
+        self.__dir_cache[dirname] = ignored
+        return ignored
+
+    def is_ignored(self, pathname):
+        """test the pathname and all its parent directories"""
+        if not self.__progs:
+            return False
+        parts = pathname.split(os.sep)
+        for index in range(1, len(parts)):
+            if self.__is_ignored_dir(os.sep.join(parts[:index])):
+                return True
+        return self.match(pathname)
+
+    def filter(self, paths, rootdir):
+        """return: a list of not ignored paths"""
+        return [path for path in paths
+                if not self.is_ignored(str(path.relative_to(rootdir)))]
+
+
+@functools.lru_cache(maxsize=16)
+def get_ignore_matcher(ignore_patterns):
+    """return: a shared IgnoreMatcher for the ignore_patterns"""
+    return IgnoreMatcher(ignore_patterns)
+
+
 def filted_ignore(paths, rootdir, ignore_patterns):
-    @functools.lru_cache(maxsize=None)
-    def get_ignore_progs(ignore_patterns):
-        ignore_progs = [
-            re.compile(pattern.strip()) for pattern
-            in ignore_patterns.split('\n')
-            if pattern.strip()]
-        return ignore_progs
-
-    ignore_progs = get_ignore_progs(ignore_patterns)
-    return [path for path in paths
-            if not any(
-                prog.search(str(path.relative_to(rootdir)))
-                for prog in ignore_progs)]
+    return get_ignore_matcher(ignore_patterns).filter(paths, rootdir)
+
+
+def parse_time(value):
+    """parse a date (and time), or a relative time "Nh", "Nd", "Nw" (= N
+    hours, days, weeks ago)
+
+    e.g., "2020-01-31", "2020-01-31T08:30", "7d"
+
+    return: a timestamp
+    raise: ValueError if value is not a time
+    """
+    match = re.search(r'^(\d+)([hdw])$', value)
+    if match:
+        seconds = {'h': 3600, 'd': 86400, 'w': 604800}[match.group(2)]
+        return time.time() - int(match.group(1)) * seconds
+    for time_format in ('%Y-%m-%d', '%Y-%m-%dT%H:%M', '%Y-%m-%dT%H:%M:%S'):
+        try:
+            dt = DT.datetime.strptime(value, time_format)
+        except ValueError:
+            continue
+        return time.mktime(dt.timetuple())
+    raise ValueError('bad time "{}"'.format(value))
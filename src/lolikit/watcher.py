@@ -0,0 +1,237 @@
+#########################################################################
+#  The MIT License (MIT)
+#
+#  Copyright (c) 2014~2016 CIVA LIN (林雪凡)
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files
+#  (the "Software"), to deal in the Software without restriction, including
+#  without limitation the rights to use, copy, modify, merge, publish,
+#  distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so,
+#  subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+#  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+##########################################################################
+
+
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+import threading
+import time
+
+try:
+    from os import scandir
+except ImportError:  # python < 3.5
+    from scandir import scandir
+
+
+class _Inotify():
+    """A tiny inotify binding by ctypes (linux only)"""
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_ISDIR = 0x40000000
+    IN_CLOEXEC = 0o2000000
+
+    WATCH_MASK = (IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+                  IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+    _EVENT_HEADER = struct.Struct('=iIII')
+
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError('inotify is only available on linux')
+        self.__libc = ctypes.CDLL(
+            ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.__libc.inotify_init1(self.IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+    def add_watch(self, dirname):
+        """return: a watch descriptor, or -1 if failed (e.g., no space)"""
+        return self.__libc.inotify_add_watch(
+            self.fd, os.fsencode(dirname), self.WATCH_MASK)
+
+    def rm_watch(self, wd):
+        self.__libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self):
+        """block until some events come
+
+        return: a list of (wd, mask, name)
+        """
+        data = os.read(self.fd, 64 * 1024)
+        events = []
+        offset = 0
+        while offset + self._EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = self._EVENT_HEADER.unpack_from(
+                data, offset)
+            offset += self._EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+
+class ProjectIndex():
+    """An in-memory index of directory listings for long-running process.
+
+    A directory will be listed when first used, then the listing be kept
+    in memory until something changed in this directory. Changes are
+    detected by inotify on linux, or checking the directory mtime on
+    every access in other platforms (or when run out of inotify watches).
+    """
+    # a directory changed in this period may be changed again within the
+    # same mtime tick, so its listing will not be trusted.
+    _RACY_SECONDS = 2
+
+    def __init__(self, rootdir):
+        self.rootdir = rootdir
+        self.__lock = threading.Lock()
+        self.__listings = {}
+        # ^ {dirname: (mtime_ns or None if watched, {name: is_dir})}
+        self.__generations = {}
+        # ^ {dirname: count of invalidation}, to drop out-dated listings
+        self.__wds = {}
+        self.__dirnames = {}
+        try:
+            self.__inotify = _Inotify()
+        except (OSError, AttributeError):
+            self.__inotify = None
+        else:
+            thread = threading.Thread(target=self.__inotify_loop)
+            thread.daemon = True
+            thread.start()
+
+    def __inotify_loop(self):
+        ino = self.__inotify
+        while True:
+            try:
+                events = ino.read_events()
+            except OSError:
+                return
+            for wd, mask, name in events:
+                if mask & ino.IN_Q_OVERFLOW:
+                    self.__invalidate_tree(str(self.rootdir))
+                    continue
+                with self.__lock:
+                    dirname = self.__dirnames.get(wd)
+                if dirname is None:
+                    continue
+                if mask & (ino.IN_IGNORED | ino.IN_DELETE_SELF |
+                           ino.IN_MOVE_SELF):
+                    self.__invalidate_tree(dirname)
+                else:
+                    self.__invalidate(dirname)
+                    if mask & ino.IN_ISDIR and mask & (
+                            ino.IN_DELETE | ino.IN_MOVED_FROM):
+                        self.__invalidate_tree(os.path.join(dirname, name))
+
+    def __invalidate(self, dirname):
+        with self.__lock:
+            self.__listings.pop(dirname, None)
+            self.__generations[dirname] = (
+                self.__generations.get(dirname, 0) + 1)
+
+    def __invalidate_tree(self, dirname):
+        """invalidate the directory & all sub-directories, and stop
+        watching them (the watches may follow a moved directory)"""
+        prefix = dirname.rstrip(os.sep) + os.sep
+        with self.__lock:
+            dirnames = [d for d in set(self.__listings).union(self.__wds)
+                        if d == dirname or d.startswith(prefix)]
+            for d in dirnames:
+                self.__listings.pop(d, None)
+                self.__generations[d] = self.__generations.get(d, 0) + 1
+                wd = self.__wds.pop(d, None)
+                if wd is not None:
+                    self.__dirnames.pop(wd, None)
+                    self.__inotify.rm_watch(wd)
+
+    def __watch(self, dirname):
+        """return: the directory be watched by inotify or not"""
+        if self.__inotify is None:
+            return False
+        with self.__lock:
+            if dirname in self.__wds:
+                return True
+        wd = self.__inotify.add_watch(dirname)
+        if wd < 0:
+            return False
+        with self.__lock:
+            self.__wds[dirname] = wd
+            self.__dirnames[wd] = dirname
+        return True
+
+    def __get_mtime_ns(self, dirname):
+        try:
+            mtime_ns = os.stat(dirname).st_mtime_ns
+        except OSError:
+            return None
+        if mtime_ns > (time.time() - self._RACY_SECONDS) * 1e9:
+            return -1
+        return mtime_ns
+
+    def __get_listing(self, dirname):
+        """return: {name: is_dir} or None if it is not a directory"""
+        with self.__lock:
+            item = self.__listings.get(dirname)
+            generation = self.__generations.get(dirname, 0)
+        if item is not None:
+            mtime_ns, entries = item
+            if mtime_ns is None:
+                return entries
+            elif mtime_ns != -1 and mtime_ns == self.__get_mtime_ns(
+                    dirname):
+                return entries
+
+        # watch (or get the mtime) before listing, so no change be missed
+        mtime_ns = None if self.__watch(dirname) else self.__get_mtime_ns(
+            dirname)
+        try:
+            entries = {entry.name: entry.is_dir()
+                       for entry in scandir(dirname)}
+        except OSError:
+            return None
+        with self.__lock:
+            if self.__generations.get(dirname, 0) == generation:
+                self.__listings[dirname] = (mtime_ns, entries)
+        return entries
+
+    def listdir(self, dir_path):
+        """return: a list of (path, is_dir) in the directory"""
+        entries = self.__get_listing(str(dir_path)) or {}
+        return [(dir_path / name, is_dir)
+                for name, is_dir in entries.items()]
+
+    def exists(self, path):
+        if path == self.rootdir:
+            return True
+        entries = self.__get_listing(str(path.parent))
+        return entries is not None and path.name in entries
+
+    def is_dir(self, path):
+        if path == self.rootdir:
+            return True
+        entries = self.__get_listing(str(path.parent))
+        return entries is not None and entries.get(path.name, False)
@@ -0,0 +1,290 @@
+#########################################################################
+#  The MIT License (MIT)
+#
+#  Copyright (c) 2014~2016 CIVA LIN (林雪凡)
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files
+#  (the "Software"), to deal in the Software without restriction, including
+#  without limitation the rights to use, copy, modify, merge, publish,
+#  distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so,
+#  subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+#  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+##########################################################################
+
+
+"""a refreshed catalog should be the same as walking the project"""
+
+import contextlib
+import os
+import shutil
+import time
+import unittest
+import unittest.mock
+
+from lolikit import catalog
+from lolikit import projectwalker
+from lolikit import utils
+
+from conftest import make_project
+
+
+_NOTES = {
+    'a.md': 'a',
+    'd1/b.md': 'b',
+    'd1/c.md': 'c',
+    'd2/rmd/rmd.md': 'resourced',
+    'd2/rmd/image.png': b'0123456789',
+    'd2/rmd/sub/data.bin': b'01234',
+    'd3/empty/.keep': '',
+    'ignored/x.md': 'x',
+    }
+
+
+class _CatalogTestCase(unittest.TestCase):
+    def setUp(self):
+        self.rootdir = make_project(_NOTES)
+        self.ignore_patterns = (
+            utils.get_config(None)['project']['ignore_patterns'] +
+            '\n^ignored$')
+        self.mtime = 1000000000
+        self.age()
+
+    def tearDown(self):
+        shutil.rmtree(str(self.rootdir))
+
+    def age(self):
+        """make every directory be modified long ago, so their rows can
+        be reused by next refresh"""
+        self.mtime += 100
+        for dirpath, _, _ in os.walk(str(self.rootdir)):
+            os.utime(dirpath, (self.mtime, self.mtime))
+
+    def refresh(self):
+        return catalog.NoteCatalog(
+            self.rootdir, self.ignore_patterns).refresh()
+
+    def assert_same_as_walk(self):
+        self.assert_same_tree(
+            self.refresh(),
+            projectwalker.walk(self.rootdir, self.ignore_patterns))
+
+    def assert_same_tree(self, tree, expected):
+        self.assertEqual(tree.md_paths, expected.md_paths)
+        self.assertEqual(tree.dir_paths, expected.dir_paths)
+        self.assertEqual(tree.rmd_paths, expected.rmd_paths)
+        self.assertEqual(list(tree.entry_counts.items()),
+                         list(expected.entry_counts.items()))
+        self.assertEqual(tree.total_size, expected.total_size)
+        self.assertEqual(
+            {path: (stat.st_mtime_ns, stat.st_size)
+             for path, stat in tree.stats.items()},
+            {path: (stat.st_mtime_ns, stat.st_size)
+             for path, stat in expected.stats.items()})
+
+    def write(self, relstr, content):
+        path = self.rootdir / relstr
+        if not path.parent.is_dir():
+            path.parent.mkdir(parents=True)
+        with open(str(path), mode='w', encoding='utf8') as f:
+            f.write(content)
+
+
+class CatalogTest(_CatalogTestCase):
+    def test_unchanged_directories_are_not_listed(self):
+        self.assert_same_as_walk()
+        with unittest.mock.patch.object(
+                projectwalker, 'scan_dir',
+                side_effect=projectwalker.scan_dir) as scan_dir:
+            self.assert_same_as_walk()
+            called_dirs = [call[0][0] for call in scan_dir.call_args_list]
+        # each directory is only listed by the walk for comparison
+        self.assertEqual(len(called_dirs), len(set(called_dirs)))
+
+    def test_threaded_walk(self):
+        for index in range(8):
+            self.write('t{}/a.md'.format(index), 'a')
+            self.write('t{}/sub/b.md'.format(index), 'b')
+            self.write('t{}/sub/sub/c.txt'.format(index), 'c')
+        self.age()
+        scan_dir = projectwalker.scan_dir
+
+        def slow_scan_dir(dir_path, *args):
+            # let the earlier directories be finished later
+            if dir_path.parent == self.rootdir:
+                name = dir_path.name
+                if name.startswith('t'):
+                    time.sleep(0.005 * (8 - int(name[1:])))
+            return scan_dir(dir_path, *args)
+
+        expected = projectwalker.walk(self.rootdir, self.ignore_patterns)
+        with unittest.mock.patch.object(
+                projectwalker, 'scan_dir', side_effect=slow_scan_dir):
+            tree = projectwalker.walk(
+                self.rootdir, self.ignore_patterns, workers=4)
+        self.assert_same_tree(tree, expected)
+
+        # a catalog refresh by threads too
+        for _ in range(2):
+            tree = catalog.NoteCatalog(
+                self.rootdir, self.ignore_patterns, workers=4).refresh()
+            self.assert_same_tree(tree, expected)
+
+    def test_add(self):
+        self.assert_same_as_walk()
+        self.write('d1/new.md', 'new')
+        self.write('d3/new/new.md', 'new')
+        self.write('d2/rmd/new.txt', 'new resource')
+        self.assert_same_as_walk()
+        self.age()
+        self.assert_same_as_walk()
+
+    def test_delete(self):
+        self.assert_same_as_walk()
+        (self.rootdir / 'd1' / 'b.md').unlink()
+        (self.rootdir / 'd2' / 'rmd' / 'image.png').unlink()
+        shutil.rmtree(str(self.rootdir / 'd3'))
+        self.assert_same_as_walk()
+        self.age()
+        self.assert_same_as_walk()
+
+    def test_unchanged_notes_are_not_stated(self):
+        self.assert_same_as_walk()
+        with unittest.mock.patch.object(
+                catalog.os, 'stat', side_effect=os.stat) as stat:
+            self.refresh()
+        stated_paths = {str(call[0][0]) for call in stat.call_args_list}
+        self.assertFalse(any(path.endswith(('.md', '.png', '.bin'))
+                             for path in stated_paths))
+
+    def test_edit_in_place(self):
+        self.assert_same_as_walk()
+        path = self.rootdir / 'd1' / 'b.md'
+        self.write('d1/b.md', 'edited, the directory mtime not changed')
+        self.write('d2/rmd/image.png', 'a larger resource')
+
+        # trusted until the directory be changed
+        tree = self.refresh()
+        self.assertEqual(tree.get_stat(path).st_size, 1)
+        self.assertIn(path, tree.trusted_paths)
+        self.assertEqual(tree.get_fresh_stat(path), os.stat(str(path)))
+        self.assertNotIn(path, tree.trusted_paths)
+
+        self.age()
+        self.assert_same_as_walk()
+
+    def test_ignore_patterns_changed(self):
+        self.assert_same_as_walk()
+        self.ignore_patterns += '\n^d1$'
+        self.assert_same_as_walk()
+
+
+class ConcurrencyTest(_CatalogTestCase):
+    """several processes use the same catalog"""
+    def connect(self):
+        path = catalog.NoteCatalog(self.rootdir, self.ignore_patterns).path
+        return contextlib.closing(catalog.connect(path))
+
+    def get_generation(self):
+        with self.connect() as conn:
+            return conn.execute(
+                "SELECT value FROM meta WHERE key = 'generation'").fetchone()
+
+    def get_dir_mtimes(self):
+        with self.connect() as conn:
+            return dict(conn.execute('SELECT path, mtime_ns FROM dirs'))
+
+    def test_refreshed_by_other_meanwhile(self):
+        self.assert_same_as_walk()
+        self.write('d1/old.md', 'old')
+        self.age()
+        scan_dirs = catalog.NoteCatalog._NoteCatalog__scan_dirs
+        refreshed_by_other = []
+
+        def scan_dirs_and_refresh_by_other(*args):
+            scans = scan_dirs(*args)
+            if not refreshed_by_other:
+                refreshed_by_other.append(True)
+                self.write('d1/new.md', 'new')
+                self.age()
+                self.refresh()
+            return scans
+
+        with unittest.mock.patch.object(
+                catalog.NoteCatalog, '_NoteCatalog__scan_dirs',
+                new=scan_dirs_and_refresh_by_other):
+            tree = self.refresh()
+
+        # our tree is returned, but not written over the newer one
+        self.assertNotIn(self.rootdir / 'd1' / 'new.md', tree.md_paths)
+        self.assertEqual(self.get_generation(), ('2',))
+        self.assertEqual(self.get_dir_mtimes()['d1'],
+                         os.stat(str(self.rootdir / 'd1')).st_mtime_ns)
+        self.assert_same_as_walk()
+
+    def test_written_by_other(self):
+        self.assert_same_as_walk()
+        self.write('d1/new.md', 'new')
+        self.age()
+        with self.connect() as conn:
+            with catalog.transaction(conn, write=True):
+                conn.execute('SELECT * FROM meta').fetchall()
+                # cannot be written, but the catalog is still used
+                with unittest.mock.patch.object(
+                        projectwalker, 'walk',
+                        side_effect=projectwalker.walk) as walk:
+                    tree = self.refresh()
+                self.assertFalse(walk.called)
+                self.assert_same_tree(tree, projectwalker.walk(
+                    self.rootdir, self.ignore_patterns))
+        self.assertEqual(self.get_generation(), ('1',))
+        self.assert_same_as_walk()
+        self.assertEqual(self.get_generation(), ('2',))
+
+    def test_locked_by_other(self):
+        # readers are blocked in the DELETE journal mode
+        self.assert_same_as_walk()
+        self.write('d1/new.md', 'new')
+        self.age()
+        with unittest.mock.patch.object(
+                catalog, '_is_network_fs', return_value=True), \
+                unittest.mock.patch.object(catalog, '_READ_TIMEOUT', 0.1):
+            with self.connect() as conn:
+                conn.execute('BEGIN EXCLUSIVE')
+                try:
+                    self.assert_same_as_walk()
+                finally:
+                    conn.execute('ROLLBACK')
+            self.assertEqual(self.get_generation(), ('1',))
+            self.assert_same_as_walk()
+        self.assertEqual(self.get_generation(), ('2',))
+
+    def test_racy_directories(self):
+        self.write('d1/new.md', 'new')
+        self.assert_same_as_walk()
+        # just modified, a later change may keep the same mtime
+        mtimes = self.get_dir_mtimes()
+        self.assertEqual(mtimes['d1'], -1)
+        self.assertEqual(mtimes['d2'],
+                         os.stat(str(self.rootdir / 'd2')).st_mtime_ns)
+
+        # and will be listed again
+        mtime = os.stat(str(self.rootdir / 'd1')).st_mtime_ns
+        self.write('d1/new2.md', 'new')
+        os.utime(str(self.rootdir / 'd1'), ns=(mtime, mtime))
+        self.assert_same_as_walk()
+
+
+if __name__ == '__main__':
+    unittest.main()
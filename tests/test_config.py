@@ -0,0 +1,62 @@
+#########################################################################
+#  The MIT License (MIT)
+#
+#  Copyright (c) 2014~2016 CIVA LIN (林雪凡)
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files
+#  (the "Software"), to deal in the Software without restriction, including
+#  without limitation the rights to use, copy, modify, merge, publish,
+#  distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so,
+#  subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+#  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+##########################################################################
+
+
+import io
+import unittest
+import unittest.mock
+
+from lolikit import utils
+from lolikit.subcommands import config as config_command
+
+
+class CheckConfigTest(unittest.TestCase):
+    def check(self, section, key, value):
+        """return: True if the config is good"""
+        config = utils.get_config(None)
+        config[section][key] = value
+        cmd = config_command.ConfigCommand(config, None)
+        with unittest.mock.patch('sys.stdout', new=io.StringIO()):
+            try:
+                cmd._ConfigCommand__check_config()
+            except SystemExit:
+                return False
+        return True
+
+    def test_project_scan_workers(self):
+        self.assertTrue(self.check('project', 'scan_workers', '1'))
+        self.assertTrue(self.check('project', 'scan_workers', '8'))
+        for value in ['0', '-1', 'x', '']:
+            self.assertFalse(self.check('project', 'scan_workers', value))
+
+    def test_find_jobs(self):
+        self.assertTrue(self.check('find', 'jobs', '0'))
+        self.assertTrue(self.check('find', 'jobs', '4'))
+        for value in ['-1', '-5', 'x', '']:
+            self.assertFalse(self.check('find', 'jobs', value))
+
+
+if __name__ == '__main__':
+    unittest.main()
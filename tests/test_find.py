@@ -0,0 +1,384 @@
+#########################################################################
+#  The MIT License (MIT)
+#
+#  Copyright (c) 2014~2016 CIVA LIN (林雪凡)
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files
+#  (the "Software"), to deal in the Software without restriction, including
+#  without limitation the rights to use, copy, modify, merge, publish,
+#  distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so,
+#  subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+#  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+##########################################################################
+
+
+"""find should give the same results as matching every note by plain
+regexes, whatever prefilter or speedup be used"""
+
+import argparse
+import io
+import os
+import pathlib
+import re
+import shutil
+import signal
+import time
+import unittest
+import unittest.mock
+
+from lolikit import utils
+from lolikit.subcommands import find
+
+from conftest import make_project
+
+
+_NOTES = {
+    'alpha.md': 'beta gamma\nalpha beta ALPHA\n',
+    'Beta note.md': '',
+    'd1/kelvin.md': 'the \u212a sign, kelvin and KELVIN\n',
+    'd1/中文.md': '中文筆記 alpha\n中文\n',
+    'd1/crlf.md': b'alpha\r\nbeta\r\ngamma\r\n',
+    'd2/latin.md': 'straße café CAFÉ alpha\n',
+    'd2/only title alpha.md': 'nothing here\n',
+    'd2/sub/rmd.md': 'beta beta beta\n',
+    'd2/sub/image.png': b'\x89PNG alpha',
+    }
+
+_PATTERNS = [
+    ['alpha'],
+    ['alpha', 'beta'],
+    ['ALPHA', 'gamma'],
+    ['a.p'],
+    ['^alpha'],
+    ['beta$'],
+    ['be+ta', 'gam|zzz'],
+    ['kelvin'],
+    ['\u212a'],
+    ['中文'],
+    ['筆記', 'alpha'],
+    ['café'],
+    ['note'],
+    ['zzz'],
+    ['alpha', 'zzz'],
+    ]
+
+
+def make_command(rootdir, **options):
+    """options = {option name of the [find] section: value}"""
+    config = utils.get_config(rootdir)
+    config['find']['file_timeout'] = '0'
+    config['find']['query_timeout'] = '0'
+    for name, value in options.items():
+        config['find'][name] = str(value)
+    return find.FindCommand(config, rootdir)
+
+
+def plain_match(rootdir, patterns):
+    """match every note by plain regexes
+
+    return: {path: (score, first_offset)} of hit notes
+    """
+    progs = [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+    results = {}
+    for dirpath, dirnames, filenames in os.walk(str(rootdir)):
+        dirnames[:] = [name for name in dirnames if name != '.loli']
+        for filename in filenames:
+            if not filename.endswith('.md'):
+                continue
+            path = pathlib.Path(dirpath, filename)
+            with open(str(path), encoding='utf8') as f:
+                content = f.read()
+            if not all(prog.search(path.stem) or prog.search(content)
+                       for prog in progs):
+                continue
+            title_matches = [m for prog in progs
+                             for m in prog.finditer(path.stem)]
+            content_matches = [m for prog in progs
+                               for m in prog.finditer(content)]
+            counts = find._Counts(
+                title_count=len(title_matches),
+                content_count=len(content_matches),
+                content_matched_length=sum(
+                    m.end() - m.start() for m in content_matches),
+                content_length=len(content),
+                first_offset=min((m.start() for m in content_matches),
+                                 default=None))
+            results[path] = (find._calculate_score(counts),
+                             counts.first_offset)
+    return results
+
+
+class FindEquivalenceTest(unittest.TestCase):
+    def setUp(self):
+        self.rootdir = make_project(_NOTES)
+
+    def tearDown(self):
+        shutil.rmtree(str(self.rootdir))
+
+    def assert_same_as_plain(self, **options):
+        for patterns in _PATTERNS:
+            expected = plain_match(self.rootdir, patterns)
+            # cold and warm, for the index & cache
+            for _ in range(2):
+                cmd = make_command(self.rootdir, **options)
+                with self.subTest(patterns=patterns, options=options):
+                    scores = {path: (score, first_offset)
+                              for path, score, first_offset
+                              in cmd.iter_scores(patterns, [], cmd.get_jobs())}
+                    self.assertEqual(scores, expected)
+                    self.assertEqual(
+                        sorted(cmd.get_all_hits(
+                            patterns, [], cmd.get_jobs())),
+                        sorted(expected))
+
+    def test_default(self):
+        self.assert_same_as_plain(index='no', cache='no', jobs=1)
+
+    def test_index(self):
+        self.assert_same_as_plain(index='yes', cache='no', jobs=1)
+
+    def test_cache(self):
+        self.assert_same_as_plain(index='no', cache='yes', jobs=1)
+
+    def test_jobs(self):
+        self.assert_same_as_plain(index='yes', cache='yes', jobs=2)
+
+    def test_path_patterns(self):
+        cmd = make_command(self.rootdir, index='yes')
+        expected = {path for path in plain_match(self.rootdir, ['alpha'])
+                    if 'd1' in str(path.relative_to(self.rootdir))}
+        self.assertEqual(set(cmd.get_all_hits(['alpha'], ['^d1'])),
+                         expected)
+
+    def test_edit_after_index_and_cache(self):
+        # the catalog will trust the stat results of notes in these
+        # directories, and an in-place edit will not change them
+        for dirpath, _, filenames in os.walk(str(self.rootdir)):
+            for name in filenames + ['.']:
+                os.utime(os.path.join(dirpath, name),
+                         (1000000000, 1000000000))
+        for patterns in _PATTERNS:
+            list(make_command(self.rootdir, index='yes').iter_scores(
+                patterns, []))
+        path = self.rootdir / 'd1' / 'kelvin.md'
+        with open(str(path), mode='w', encoding='utf8') as f:
+            f.write('alpha and zzz, the size is changed\n')
+        self.assert_same_as_plain(index='yes', cache='yes', jobs=1)
+
+
+class JobsTest(unittest.TestCase):
+    def test_jobs_argument(self):
+        self.assertEqual(find._non_negative_int('0'), 0)
+        self.assertEqual(find._non_negative_int('4'), 4)
+        for value in ['-1', '-5', 'x', '']:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                find._non_negative_int(value)
+
+
+class ReadHitTest(unittest.TestCase):
+    def setUp(self):
+        self.rootdir = make_project(_NOTES)
+
+    def tearDown(self):
+        shutil.rmtree(str(self.rootdir))
+
+    def test_read_hit_decodes_the_same_as_text_mode(self):
+        matcher = find._Matcher(['.*'])
+        for relstr in _NOTES:
+            if not relstr.endswith('.md'):
+                continue
+            path = self.rootdir / relstr
+            with open(str(path), encoding='utf8') as f:
+                expected = f.read()
+            self.assertEqual(find._read_hit(path, matcher), (path, expected))
+
+    def test_byte_prefilter_never_rejects_a_hit(self):
+        for patterns in _PATTERNS:
+            matcher = find._Matcher(patterns)
+            for path in plain_match(self.rootdir, patterns):
+                _, content = find._read_hit(path, matcher)
+                self.assertIsNotNone(content, (patterns, path))
+
+
+class MatcherTest(unittest.TestCase):
+    texts = [
+        '',
+        'alpha Alpha ALPHA alphalpha',
+        'aaaa aa a',
+        '\u212a kelvin K \u0130 i \u0131 I \u017f s',
+        'straße STRASSE café CAFÉ',
+        '中文筆記 中文',
+        ]
+    patterns = ['alpha', 'aa', 'k', 'kelvin', 'i', 's', 'café', '中文', 'x']
+
+    def test_count_all_is_the_same_as_regex(self):
+        matcher = find._Matcher(self.patterns)
+        for text in self.texts:
+            expected = []
+            for pattern in self.patterns:
+                matches = list(re.finditer(pattern, text, re.IGNORECASE))
+                expected.append((len(matches), sum(
+                    m.end() - m.start() for m in matches)))
+            self.assertEqual(matcher.count_all(text), expected, text)
+
+    def test_find_first_is_the_same_as_regex(self):
+        for pattern in self.patterns:
+            matcher = find._Matcher([pattern])
+            for text in self.texts:
+                match = re.search(pattern, text, re.IGNORECASE)
+                self.assertEqual(matcher.find_first(text),
+                                 match.start() if match else None,
+                                 (pattern, text))
+
+
+class AttachmentsTest(unittest.TestCase):
+    def setUp(self):
+        self.rootdir = make_project({
+            'rmd/rmd.md': 'a resourced note',
+            'rmd/text.txt': 'zeta\r\neta',
+            'rmd/binary.dat': b'\0 theta',
+            'rmd/latin1.txt': 'iota caf\xe9'.encode('latin1'),
+            'rmd/large.txt': 'kappa ' * 300,
+            # not resourced, there are two notes in the directory
+            'plain/plain.md': 'a plain note',
+            'plain/other.md': 'other',
+            'plain/plain.txt': 'zeta',
+            })
+
+    def tearDown(self):
+        shutil.rmtree(str(self.rootdir))
+
+    def get_hits(self, patterns):
+        cmd = make_command(self.rootdir, attachment_max_size=1)
+        hits = list(cmd.get_all_hits(patterns, [], scope='attachments'))
+        self.assertEqual(
+            [data[0] for data in cmd.iter_scores(
+                patterns, [], scope='attachments')],
+            hits)
+        return hits
+
+    def test_text_attachments(self):
+        rmd_path = self.rootdir / 'rmd' / 'rmd.md'
+        self.assertEqual(self.get_hits(['zeta']), [rmd_path])
+        self.assertEqual(self.get_hits(['resourced', r'zeta\neta']),
+                         [rmd_path])
+        self.assertEqual(
+            sorted(self.get_hits(['note'])),
+            sorted([rmd_path, self.rootdir / 'plain' / 'plain.md']))
+
+    def test_skipped_attachments(self):
+        self.assertEqual(self.get_hits(['theta']), [])  # binary
+        self.assertEqual(self.get_hits(['iota']), [])  # not UTF-8
+        self.assertEqual(self.get_hits(['kappa']), [])  # too large
+
+    def test_max_size_when_reading(self):
+        path = self.rootdir / 'rmd' / 'text.txt'
+        for max_size, expected in [(9, 'zeta\neta'), (8, None), (0, None)]:
+            self.assertEqual(find._read_attachment(path, max_size),
+                             expected)
+
+    def test_attachments_grow_after_listed(self):
+        cmd = make_command(self.rootdir, attachment_max_size=1)
+        rmd_path = self.rootdir / 'rmd' / 'rmd.md'
+        attachments = cmd.get_attachments([rmd_path])
+        self.assertIn((self.rootdir / 'rmd' / 'text.txt', 1024),
+                      attachments[rmd_path])
+        with open(str(self.rootdir / 'rmd' / 'text.txt'), mode='a') as f:
+            f.write(' lambda' * 200)
+
+        matcher = find._Matcher(['lambda'])
+        _, content = find._read_hit(rmd_path, matcher, attachments)
+        self.assertEqual(content, 'a resourced note')
+
+
+# takes minutes to fail without a time limit
+_SLOW_PATTERN = '(a+)+b'
+_SLOW_TEXT = 'hello b ' + 'a' * 32 + '!'
+
+
+@unittest.skipUnless(hasattr(signal, 'setitimer'), 'need signal.setitimer')
+class TimeoutTest(unittest.TestCase):
+    def setUp(self):
+        self.rootdir = make_project({
+            'slow.md': _SLOW_TEXT,
+            'fast.md': 'aab',
+            })
+
+    def tearDown(self):
+        shutil.rmtree(str(self.rootdir))
+
+    def test_budget(self):
+        budget = find._Budget(0.1)
+        start = time.time()
+        with self.assertRaises(find._FileTimeout):
+            budget.run(re.search, _SLOW_PATTERN, _SLOW_TEXT)
+        self.assertLess(time.time() - start, 5)
+        self.assertTrue(budget.run(re.search, _SLOW_PATTERN, 'aab'))
+
+        budget = find._Budget(10, time.time() + 0.1)
+        with self.assertRaises(find._QueryTimeout):
+            budget.run(re.search, _SLOW_PATTERN, _SLOW_TEXT)
+
+    def test_skip_slow_notes(self):
+        cmd = make_command(self.rootdir, cache='no')
+        cmd.config['find']['file_timeout'] = '0.1'
+        with unittest.mock.patch('sys.stderr', new=io.StringIO()) as stderr:
+            scores = list(cmd.iter_scores([_SLOW_PATTERN], []))
+            hits = list(cmd.get_all_hits([_SLOW_PATTERN], []))
+        self.assertEqual([data[0] for data in scores],
+                         [self.rootdir / 'fast.md'])
+        self.assertEqual(hits, [self.rootdir / 'fast.md'])
+        self.assertIn('slow.md', stderr.getvalue())
+
+    def test_skip_slow_titles(self):
+        (self.rootdir / 'slow.md').unlink()
+        slow_path = self.rootdir / 'titles' / ('a' * 32 + '!.md')
+        slow_path.parent.mkdir()
+        with open(str(slow_path), mode='w', encoding='utf8') as f:
+            f.write('ab')  # the title is matched first
+        cmd = make_command(self.rootdir, cache='no')
+        cmd.config['find']['file_timeout'] = '0.1'
+        start = time.time()
+        for scope in ['all', 'title', 'path']:
+            with unittest.mock.patch(
+                    'sys.stderr', new=io.StringIO()) as stderr:
+                scores = list(cmd.iter_scores(
+                    [_SLOW_PATTERN], [], scope=scope))
+                hits = list(cmd.get_all_hits(
+                    [_SLOW_PATTERN], [], scope=scope))
+            self.assertNotIn(slow_path, [data[0] for data in scores])
+            self.assertNotIn(slow_path, hits)
+            self.assertIn('aaaa!', stderr.getvalue(), scope)
+        self.assertLess(time.time() - start, 10)
+
+    def test_stop_slow_query(self):
+        cmd = make_command(self.rootdir, cache='no')
+        cmd.config['find']['query_timeout'] = '0.1'
+        start = time.time()
+        with unittest.mock.patch('sys.stderr', new=io.StringIO()) as stderr:
+            list(cmd.iter_scores([_SLOW_PATTERN], []))
+        self.assertLess(time.time() - start, 5)
+        self.assertIn('incomplete', stderr.getvalue())
+
+    def test_snippet(self):
+        path = self.rootdir / 'slow.md'
+        self.assertEqual(
+            find._get_snippet(path, 0, [_SLOW_PATTERN],
+                              budget=find._Budget(0.1)),
+            _SLOW_TEXT)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+#########################################################################
+#  The MIT License (MIT)
+#
+#  Copyright (c) 2014~2016 CIVA LIN (林雪凡)
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files
+#  (the "Software"), to deal in the Software without restriction, including
+#  without limitation the rights to use, copy, modify, merge, publish,
+#  distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so,
+#  subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+#  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+##########################################################################
+
+
+import contextlib
+import os
+import shutil
+import sqlite3
+import unittest
+import unittest.mock
+
+from lolikit import catalog
+from lolikit import findindex
+from lolikit import projectwalker
+
+from conftest import make_project
+
+
+class LockedStoreTest(unittest.TestCase):
+    """the writer cannot commit while other process is reading, which
+    happen with the DELETE journal mode (e.g., on network file systems)"""
+    def setUp(self):
+        self.rootdir = make_project({
+            'a.md': 'alpha',
+            'b.md': 'beta',
+            })
+        for name in ['a.md', 'b.md', '.']:
+            os.utime(str(self.rootdir / name), (1000000000, 1000000000))
+        patches = [
+            unittest.mock.patch.object(
+                catalog, '_is_network_fs', return_value=True),
+            unittest.mock.patch.object(catalog, '_READ_TIMEOUT', 0.1),
+            ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(str(self.rootdir))
+
+    @contextlib.contextmanager
+    def read_by_other(self, path):
+        with contextlib.closing(catalog.connect(path)) as conn:
+            with catalog.transaction(conn):
+                conn.execute('SELECT * FROM meta').fetchall()
+                yield
+
+    def test_rollback_if_cannot_commit(self):
+        path = self.rootdir / '.loli' / 'test.sqlite'
+        schema = 'CREATE TABLE IF NOT EXISTS meta (key TEXT, value TEXT);'
+        with contextlib.closing(catalog.connect(path, schema)) as conn:
+            with self.read_by_other(path):
+                with self.assertRaises(sqlite3.OperationalError):
+                    with catalog.transaction(conn, write=True):
+                        conn.execute("INSERT INTO meta VALUES ('a', 'b')")
+                self.assertFalse(conn.in_transaction)
+            self.assertEqual(
+                conn.execute('SELECT * FROM meta').fetchall(), [])
+
+    def test_index_not_committed(self):
+        index = findindex.TrigramIndex(self.rootdir)
+        tree = projectwalker.walk(self.rootdir, '^\\.loli$')
+        self.assertEqual(index.get_candidates(tree, ['gamma']), set())
+
+        path = self.rootdir / 'b.md'
+        with open(str(path), mode='w', encoding='utf8') as f:
+            f.write('beta gamma')
+        os.utime(str(path), (1000000000, 1000000000))
+        tree = projectwalker.walk(self.rootdir, '^\\.loli$')
+        with self.read_by_other(index.path):
+            candidates = index.get_candidates(tree, ['gamma'])
+        # the changed note is not in the index, it must be a candidate
+        self.assertTrue(candidates is None or path in candidates)
+        self.assertEqual(index.get_candidates(tree, ['gamma']), {path})
+
+
+class IndexUpdateTest(unittest.TestCase):
+    def setUp(self):
+        self.rootdir = make_project({
+            'n{}.md'.format(i): 'alpha {}'.format(i) for i in range(10)})
+        for name in os.listdir(str(self.rootdir)) + ['.']:
+            os.utime(str(self.rootdir / name), (1000000000, 1000000000))
+        self.tree = projectwalker.walk(self.rootdir, '^\\.loli$')
+        self.index = findindex.TrigramIndex(self.rootdir)
+
+    def tearDown(self):
+        shutil.rmtree(str(self.rootdir))
+
+    def test_read_notes_without_write_lock(self):
+        read = findindex.TrigramIndex._TrigramIndex__read
+
+        def read_and_write_by_other(index, path):
+            # raise sqlite3.OperationalError if the index is locked
+            with contextlib.closing(catalog.connect(self.index.path)) as conn:
+                with catalog.transaction(conn, write=True):
+                    pass
+            return read(index, path)
+
+        with unittest.mock.patch.object(
+                findindex.TrigramIndex, '_TrigramIndex__read',
+                read_and_write_by_other):
+            self.assertEqual(
+                self.index.get_candidates(self.tree, ['alpha 3']),
+                {self.rootdir / 'n3.md'})
+
+    def test_batches(self):
+        with unittest.mock.patch.object(findindex, '_BATCH_SIZE', 3):
+            self.assertEqual(
+                self.index.get_candidates(self.tree, ['alpha 3']),
+                {self.rootdir / 'n3.md'})
+            (self.rootdir / 'n3.md').unlink()
+            tree = projectwalker.walk(self.rootdir, '^\\.loli$')
+            self.assertEqual(
+                self.index.get_candidates(tree, ['alpha']),
+                set(tree.md_paths))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+#########################################################################
+#  The MIT License (MIT)
+#
+#  Copyright (c) 2014~2016 CIVA LIN (林雪凡)
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files
+#  (the "Software"), to deal in the Software without restriction, including
+#  without limitation the rights to use, copy, modify, merge, publish,
+#  distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so,
+#  subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+#  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+##########################################################################
+
+
+"""parse & evaluate the queries of "loli find --query"."""
+
+import os
+import pathlib
+import time
+import unittest
+
+from lolikit import findquery
+
+
+_ROOTDIR = pathlib.Path('/project')
+_NOW = time.time()
+
+
+class _FakeTree():
+    def __init__(self, category, mtime, size):
+        self.category = category
+        self.stat = os.stat_result((0, 0, 0, 0, 0, 0, size, 0, mtime, 0))
+
+    def get_category(self, path):
+        return self.category
+
+    def get_stat(self, path):
+        return self.stat
+
+    def get_fresh_stat(self, path):
+        return self.stat
+
+
+class QueryTest(unittest.TestCase):
+    def make_note(self, relstr='work/Meeting notes.md', content='',
+                  category='work', mtime=_NOW, size=100):
+        self.read_count = 0
+
+        def read(path):
+            self.read_count += 1
+            return content
+
+        return findquery.QueryNote(
+            _ROOTDIR / relstr, _ROOTDIR,
+            _FakeTree(category, mtime, size), read)
+
+    def assert_match(self, query, note, expected=True):
+        self.assertEqual(
+            findquery.parse(query).evaluate(note), expected, query)
+
+    def test_patterns(self):
+        note = self.make_note(content='alpha beta\ngamma')
+        self.assert_match('alpha', note)
+        self.assert_match('ALPHA', note)
+        self.assert_match('meeting', note)  # title
+        self.assert_match('al.ha gam+a$', note)
+        self.assert_match('delta', note, False)
+        self.assert_match('"alpha beta"', note)
+        self.assert_match('"beta alpha"', note, False)
+
+    def test_fields(self):
+        note = self.make_note(content='alpha (a+)+b')
+        self.assert_match('title:meeting', note)
+        self.assert_match('title:alpha', note, False)
+        self.assert_match('content:alpha', note)
+        self.assert_match('content:meeting', note, False)
+        self.assert_match('path:^work/', note)
+        self.assert_match('category:^work$', note)
+        self.assert_match('category:home', note, False)
+        self.assert_match(r'content:"\(a\+\)\+b"', note)
+
+    def test_compares(self):
+        note = self.make_note(mtime=_NOW - 3 * 86400, size=20 * 1024)
+        self.assert_match('mtime<2d', note)
+        self.assert_match('mtime>4d', note)
+        self.assert_match('mtime>2d', note, False)
+        self.assert_match('mtime>2000-01-01', note)
+        self.assert_match('mtime<2000-01-01T12:00', note, False)
+        self.assert_match('size>=20k', note)
+        self.assert_match('size>20k', note, False)
+        self.assert_match('size=20480', note)
+        self.assert_match('size<0.1m', note)
+
+    def test_boolean_operators(self):
+        note = self.make_note(content='alpha beta')
+        self.assert_match('alpha AND beta', note)
+        self.assert_match('alpha AND delta', note, False)
+        self.assert_match('delta OR beta', note)
+        self.assert_match('NOT delta', note)
+        self.assert_match('NOT alpha', note, False)
+        self.assert_match('NOT NOT alpha', note)
+        # AND binds tighter than OR
+        self.assert_match('delta alpha OR beta', note)
+        self.assert_match('delta (alpha OR beta)', note, False)
+        self.assert_match('(delta OR alpha) (gamma OR beta)', note)
+        # lowercase operators are patterns
+        self.assert_match('alpha and beta', note, False)
+
+    def test_cheap_terms_first(self):
+        note = self.make_note(content='alpha')
+        self.assert_match('alpha title:zzz', note, False)
+        self.assertEqual(self.read_count, 0)
+        self.assert_match('content:alpha OR category:work', note)
+        self.assertEqual(self.read_count, 0)
+        self.assert_match('alpha size<1k mtime>1d', note)
+        self.assertEqual(self.read_count, 1)
+
+    def test_extra_patterns(self):
+        note = self.make_note(content='alpha beta')
+        self.assertTrue(
+            findquery.parse('alpha', ['beta']).evaluate(note))
+        self.assertFalse(
+            findquery.parse('alpha', ['delta']).evaluate(note))
+
+    def test_get_patterns(self):
+        query = findquery.parse(
+            'alpha (content:beta OR title:gamma) NOT delta'
+            ' NOT (epsilon NOT zeta) size<1k', ['eta'])
+        self.assertEqual(sorted(query.get_patterns()),
+                         ['alpha', 'beta', 'eta', 'zeta'])
+
+    def test_errors(self):
+        for query in ['', '  ', 'alpha OR', 'NOT', '(alpha', 'alpha )',
+                      'AND alpha', '"alpha', 'tag:"alpha"', 'content:[a',
+                      'size>big', 'mtime<yesterday']:
+            with self.subTest(query=query):
+                with self.assertRaises(findquery.QueryError):
+                    findquery.parse(query)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+#########################################################################
+#  The MIT License (MIT)
+#
+#  Copyright (c) 2014~2016 CIVA LIN (林雪凡)
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files
+#  (the "Software"), to deal in the Software without restriction, including
+#  without limitation the rights to use, copy, modify, merge, publish,
+#  distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so,
+#  subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+#  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+##########################################################################
+
+
+import random
+import unittest
+
+from lolikit import itemselector as IS
+
+
+class RankedDatasTest(unittest.TestCase):
+    def setUp(self):
+        rand = random.Random(0)
+        # many ties, which should keep the original order
+        self.datas = [(i, rand.randint(0, 20)) for i in range(200)]
+        self.expected = sorted(
+            self.datas, key=lambda data: data[1], reverse=True)
+
+    def make_ranked(self):
+        return IS.RankedDatas(self.datas, key=lambda data: data[1])
+
+    def test_index(self):
+        ranked = self.make_ranked()
+        self.assertEqual(len(ranked), len(self.expected))
+        for index in [0, 1, 9, 10, 55, 199, -1, -200]:
+            self.assertEqual(ranked[index], self.expected[index], index)
+        for index in [200, -201]:
+            with self.assertRaises(IndexError):
+                ranked[index]
+
+    def test_slice(self):
+        ranked = self.make_ranked()
+        for start, stop in [(0, 10), (10, 20), (5, 5), (190, 250),
+                            (-10, None), (None, None)]:
+            self.assertEqual(ranked[start:stop], self.expected[start:stop],
+                             (start, stop))
+
+    def test_iter(self):
+        ranked = self.make_ranked()
+        ranked[0:10]
+        self.assertEqual(list(ranked), self.expected)
+        self.assertEqual(list(IS.RankedDatas([], key=None)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,281 @@
+#########################################################################
+#  The MIT License (MIT)
+#
+#  Copyright (c) 2014~2016 CIVA LIN (林雪凡)
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files
+#  (the "Software"), to deal in the Software without restriction, including
+#  without limitation the rights to use, copy, modify, merge, publish,
+#  distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so,
+#  subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+#  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+##########################################################################
+
+
+import datetime as DT
+import os
+import re
+import shutil
+import tempfile
+import time
+import unittest
+
+from conftest import make_project
+from lolikit import utils
+
+
+class ParseTimeTest(unittest.TestCase):
+    def test_relative(self):
+        for value, seconds in [('0h', 0), ('3h', 3 * 3600),
+                               ('2d', 2 * 86400), ('1w', 7 * 86400)]:
+            self.assertAlmostEqual(utils.parse_time(value),
+                                   time.time() - seconds, delta=5)
+
+    def test_absolute(self):
+        for value, dt in [
+                ('2020-01-31', DT.datetime(2020, 1, 31)),
+                ('2020-01-31T08:30', DT.datetime(2020, 1, 31, 8, 30)),
+                ('2020-01-31T08:30:15',
+                 DT.datetime(2020, 1, 31, 8, 30, 15))]:
+            self.assertEqual(utils.parse_time(value),
+                             time.mktime(dt.timetuple()))
+
+    def test_bad_time(self):
+        for value in ['', 'yesterday', '3', '3y', '-3d', '2020-13-01',
+                      '2020-01-31 08:30']:
+            with self.assertRaises(ValueError):
+                utils.parse_time(value)
+
+
+def _join(*parts):
+    return os.sep.join(parts)
+
+
+class GlobToRegexTest(unittest.TestCase):
+    def assertGlob(self, glob, matched, unmatched):
+        prog = re.compile(utils._glob_to_regex(glob))
+        for pathname in matched:
+            self.assertTrue(prog.search(pathname), (glob, pathname))
+        for pathname in unmatched:
+            self.assertFalse(prog.search(pathname), (glob, pathname))
+
+    def test_wildcards(self):
+        self.assertGlob('*.swp', ['a.swp', _join('d', 'a.swp')],
+                        ['a.swpx', 'a.md'])
+        self.assertGlob('d/*.md', [_join('d', 'a.md')],
+                        [_join('d', 'e', 'a.md'), _join('x', 'd', 'a.md')])
+        self.assertGlob('d/**/a.md',
+                        [_join('d', 'a.md'), _join('d', 'e', 'f', 'a.md')],
+                        [_join('d', 'b.md')])
+        self.assertGlob('a?c', ['abc'], ['ac', _join('a', 'c')])
+
+    def test_brackets(self):
+        self.assertGlob('a[bc]d', ['abd', 'acd'], ['aed', 'ad'])
+        self.assertGlob('a[!b]d', ['acd'], ['abd', 'ad'])
+
+    def test_brackets_never_match_separator(self):
+        self.assertGlob('a[!b]d', [], [_join('a', 'd')])
+        self.assertGlob('a[!/]d', [], [_join('a', 'd')])
+        self.assertGlob('a[/]d', [], [_join('a', 'd')])
+
+
+class IgnoreMatcherTest(unittest.TestCase):
+    PATHNAMES = [
+        'a.md', 'A.MD', 'a.swp', '.git', 'readme', 'README', 'aa', 'abab',
+        'xyx', 'abc', _join('d', 'a.md'), _join('d', 'e', 'a.swp'),
+        _join('.git', 'config'), _join('build', 'x'), _join('a', 'b')]
+
+    def assertSameAsEachPattern(self, patterns):
+        matcher = utils.IgnoreMatcher('\n'.join(patterns))
+        progs = [re.compile(utils._glob_to_regex(p[5:]))
+                 if p.startswith('glob:') else re.compile(p)
+                 for p in patterns]
+        for pathname in self.PATHNAMES:
+            self.assertEqual(
+                matcher.match(pathname),
+                any(prog.search(pathname) for prog in progs),
+                (patterns, pathname))
+        return matcher
+
+    def get_progs(self, matcher):
+        return matcher._IgnoreMatcher__progs
+
+    def test_combined(self):
+        matcher = self.assertSameAsEachPattern(
+            [r'^\.git$', r'\.swp$', 'glob:build/', 'glob:*.[mM][dD]',
+             '^(a|b)+$'])
+        self.assertEqual(len(self.get_progs(matcher)), 1)
+
+    def test_inline_flags_are_not_combined(self):
+        for patterns in [
+                ['(?i)^readme$', r'\.swp$'],
+                [r'\.swp$', '(?i)^readme$'],
+                ['(?x) ^ a \\. md $', '^abc$'],
+                [r'\.swp$', '(?s)^a.md$']]:
+            matcher = self.assertSameAsEachPattern(patterns)
+            self.assertEqual(len(self.get_progs(matcher)), len(patterns))
+
+    def test_backreferences_are_not_combined(self):
+        for patterns in [
+                [r'\.swp$', r'^(.)\1$'],
+                [r'^(ab)\1$', r'^(x)y\1$'],
+                [r'\.swp$', r'^(?P<c>.)y(?P=c)$']]:
+            matcher = self.assertSameAsEachPattern(patterns)
+            self.assertEqual(len(self.get_progs(matcher)), len(patterns))
+
+    def test_no_pattern(self):
+        matcher = self.assertSameAsEachPattern([])
+        self.assertFalse(matcher.is_ignored(_join('a', 'b')))
+
+    def test_ignored_directories(self):
+        matcher = utils.IgnoreMatcher('^build$\nglob:*.swp')
+        self.assertTrue(matcher.is_ignored('build'))
+        self.assertTrue(matcher.is_ignored(_join('build', 'a.md')))
+        self.assertTrue(matcher.is_ignored(_join('d', 'a.swp', 'a.md')))
+        self.assertFalse(matcher.is_ignored(_join('d', 'build.md')))
+        self.assertFalse(matcher.is_ignored(_join('d', 'build', 'a.md')))
+
+    def test_directory_verdicts_are_cached(self):
+        matcher = utils.IgnoreMatcher('^build$', dir_cache_size=3)
+        cache = matcher._IgnoreMatcher__dir_cache
+        self.assertTrue(matcher.is_ignored(_join('build', 'a', 'b.md')))
+        self.assertEqual(cache, {'build': True})
+        self.assertFalse(matcher.is_ignored(_join('d', 'e', 'b.md')))
+        self.assertEqual(cache, {'build': True, 'd': False,
+                                 _join('d', 'e'): False})
+
+        # the cached verdicts are used
+        cache['d'] = True
+        self.assertTrue(matcher.is_ignored(_join('d', 'b.md')))
+
+        # and cleared when full
+        self.assertFalse(matcher.is_ignored(_join('x', 'b.md')))
+        self.assertEqual(cache, {'x': False})
+
+class DirMtimeCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.dirs = []
+        for index in range(3):
+            dir_path = os.path.join(self.tempdir, str(index))
+            os.mkdir(dir_path)
+            os.utime(dir_path, (1000000000, 1000000000))
+            self.dirs.append(dir_path)
+        self.computed = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def get(self, cache, index):
+        def compute():
+            self.computed.append(index)
+            return len(self.computed)
+        return cache.get(index, self.dirs[index], compute)
+
+    def test_recompute_when_mtime_changed(self):
+        cache = utils.DirMtimeCache()
+        self.assertEqual(self.get(cache, 0), 1)
+        self.assertEqual(self.get(cache, 0), 1)
+        os.utime(self.dirs[0], (1000000001, 1000000001))
+        self.assertEqual(self.get(cache, 0), 2)
+        self.assertEqual(self.get(cache, 0), 2)
+        self.assertEqual(cache.cache_info(), (2, 2, 4096, 1))
+
+    def test_missing_directory(self):
+        cache = utils.DirMtimeCache()
+        self.assertEqual(self.get(cache, 0), 1)
+        os.rmdir(self.dirs[0])
+        self.assertEqual(self.get(cache, 0), 2)
+        self.assertEqual(self.get(cache, 0), 2)
+        os.mkdir(self.dirs[0])
+        self.assertEqual(self.get(cache, 0), 3)
+
+    def test_evict_least_recently_used(self):
+        cache = utils.DirMtimeCache(maxsize=2)
+        self.get(cache, 0)
+        self.get(cache, 1)
+        self.get(cache, 0)
+        self.get(cache, 2)
+        self.assertEqual(cache.cache_info().currsize, 2)
+        self.assertEqual(self.computed, [0, 1, 2])
+        self.get(cache, 0)
+        self.get(cache, 2)
+        self.assertEqual(self.computed, [0, 1, 2])
+        self.get(cache, 1)
+        self.assertEqual(self.computed, [0, 1, 2, 1])
+
+    def test_decorator(self):
+        @utils.dir_mtime_cache(lambda index: self.dirs[index], maxsize=2)
+        def func(index):
+            self.computed.append(index)
+            return index * 10
+
+        self.assertEqual([func(0), func(0), func(1)], [0, 0, 10])
+        self.assertEqual(self.computed, [0, 1])
+        os.utime(self.dirs[1], (1000000001, 1000000001))
+        self.assertEqual(func(1), 10)
+        self.assertEqual(self.computed, [0, 1, 1])
+        self.assertEqual(func.cache_info(), (1, 3, 2, 2))
+        func.cache_clear()
+        self.assertEqual(func.cache_info(), (0, 0, 2, 0))
+
+
+class ResourcedNoteTest(unittest.TestCase):
+    def setUp(self):
+        self.rootdir = make_project({'r/note.md': 'a'})
+        self.note_path = self.rootdir / 'r' / 'note.md'
+        self.ignore_patterns = (
+            utils.get_config(None)['project']['ignore_patterns'])
+        self.mtime = 1000000000
+        self.age()
+
+    def tearDown(self):
+        shutil.rmtree(str(self.rootdir))
+
+    def age(self):
+        """let every change have a different mtime"""
+        self.mtime += 1
+        os.utime(str(self.note_path.parent), (self.mtime, self.mtime))
+
+    def is_rmd(self):
+        return utils.is_rmd(
+            self.note_path, self.rootdir, self.ignore_patterns)
+
+    def test_fresh_after_resource_added(self):
+        self.assertFalse(self.is_rmd())
+        self.assertEqual(utils.get_resource_paths(self.note_path), [])
+
+        (self.note_path.parent / 'a.png').touch()
+        self.age()
+        self.assertTrue(self.is_rmd())
+        self.assertEqual(utils.get_resource_paths(self.note_path),
+                         [self.note_path.parent / 'a.png'])
+
+        (self.note_path.parent / 'other.md').touch()
+        self.age()
+        self.assertFalse(self.is_rmd())
+
+    def test_fresh_after_resource_removed(self):
+        (self.note_path.parent / 'a.png').touch()
+        self.age()
+        self.assertTrue(self.is_rmd())
+        (self.note_path.parent / 'a.png').unlink()
+        self.age()
+        self.assertFalse(self.is_rmd())
+        self.assertEqual(utils.get_resource_paths(self.note_path), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+#########################################################################
+#  The MIT License (MIT)
+#
+#  Copyright (c) 2014~2016 CIVA LIN (林雪凡)
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files
+#  (the "Software"), to deal in the Software without restriction, including
+#  without limitation the rights to use, copy, modify, merge, publish,
+#  distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so,
+#  subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+#  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+#  TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+##########################################################################
+
+
+import os
+import pathlib
+import shutil
+import tempfile
+import time
+import unittest
+import unittest.mock
+
+from lolikit import watcher
+
+
+def _has_inotify():
+    try:
+        os.close(watcher._Inotify().fd)
+    except (OSError, AttributeError):
+        return False
+    return True
+
+
+class _ProjectIndexTest():
+    """the common tests of both inotify & mtime checking"""
+    def setUp(self):
+        self.rootdir = pathlib.Path(tempfile.mkdtemp())
+        for relstr in ['d1/sub', 'd2/sub']:
+            (self.rootdir / relstr).mkdir(parents=True)
+        for relstr in ['a.md', 'd1/b.md', 'd1/sub/c.md', 'd2/sub/d.md']:
+            (self.rootdir / relstr).touch()
+        self.index = self.make_index()
+
+    def tearDown(self):
+        shutil.rmtree(str(self.rootdir))
+
+    def make_index(self):
+        return watcher.ProjectIndex(self.rootdir)
+
+    def wait_for(self, func, expected):
+        """the changes may be noticed a little later"""
+        deadline = time.time() + 5
+        while func() != expected and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(func(), expected)
+
+    def listdir(self, relstr='.'):
+        dir_path = self.rootdir / relstr
+        return sorted((str(path.relative_to(dir_path)), is_dir)
+                      for path, is_dir in self.index.listdir(dir_path))
+
+    def test_listdir(self):
+        self.assertEqual(self.listdir(), [
+            ('a.md', False), ('d1', True), ('d2', True)])
+        self.assertEqual(self.listdir('d1'), [
+            ('b.md', False), ('sub', True)])
+        self.assertEqual(self.listdir('no'), [])
+        self.assertTrue(self.index.exists(self.rootdir / 'd1' / 'b.md'))
+        self.assertFalse(self.index.exists(self.rootdir / 'd1' / 'x.md'))
+        self.assertTrue(self.index.is_dir(self.rootdir / 'd1' / 'sub'))
+        self.assertFalse(self.index.is_dir(self.rootdir / 'a.md'))
+
+    def test_create(self):
+        self.listdir('d1')
+        (self.rootdir / 'd1' / 'new.md').touch()
+        (self.rootdir / 'd1' / 'new').mkdir()
+        self.wait_for(lambda: self.listdir('d1'), [
+            ('b.md', False), ('new', True), ('new.md', False),
+            ('sub', True)])
+        self.assertEqual(self.listdir('d1/new'), [])
+
+    def test_remove(self):
+        self.listdir('d1')
+        self.listdir('d1/sub')
+        (self.rootdir / 'd1' / 'b.md').unlink()
+        shutil.rmtree(str(self.rootdir / 'd1' / 'sub'))
+        self.wait_for(lambda: self.listdir('d1'), [])
+        self.wait_for(lambda: self.listdir('d1/sub'), [])
+        self.assertFalse(self.index.exists(self.rootdir / 'd1' / 'sub'))
+
+    def test_rename(self):
+        self.listdir()
+        self.listdir('d2')
+        self.listdir('d2/sub')
+        os.rename(str(self.rootdir / 'a.md'), str(self.rootdir / 'z.md'))
+        os.rename(str(self.rootdir / 'd2'), str(self.rootdir / 'd3'))
+        self.wait_for(lambda: self.listdir(), [
+            ('d1', True), ('d3', True), ('z.md', False)])
+        self.wait_for(lambda: self.listdir('d2'), [])
+        self.wait_for(lambda: self.listdir('d2/sub'), [])
+        self.assertEqual(self.listdir('d3/sub'), [('d.md', False)])
+
+
+@unittest.skipUnless(_has_inotify(), 'need inotify')
+class InotifyTest(_ProjectIndexTest, unittest.TestCase):
+    def get_watched(self):
+        wds = self.index._ProjectIndex__wds
+        return sorted(
+            str(pathlib.Path(dirname).relative_to(self.rootdir))
+            for dirname in wds)
+
+    def test_listings_are_kept(self):
+        self.listdir('d1')
+        with unittest.mock.patch.object(watcher, 'scandir') as scandir:
+            self.listdir('d1')
+        self.assertFalse(scandir.called)
+
+    def test_removed_directory_drop_watches(self):
+        self.listdir('d1')
+        self.listdir('d1/sub')
+        self.assertEqual(self.get_watched(), ['d1', 'd1/sub'])
+        shutil.rmtree(str(self.rootdir / 'd1'))
+        self.wait_for(self.get_watched, [])
+
+    def test_moved_directory_drop_watches(self):
+        self.listdir()
+        self.listdir('d2')
+        self.listdir('d2/sub')
+        self.assertEqual(self.get_watched(), ['.', 'd2', 'd2/sub'])
+        os.rename(str(self.rootdir / 'd2'), str(self.rootdir / 'd3'))
+        self.wait_for(self.get_watched, ['.'])
+        # the moved directory can be watched again by its new path
+        self.assertEqual(self.listdir('d3/sub'), [('d.md', False)])
+        self.assertEqual(self.get_watched(), ['.', 'd3/sub'])
+
+
+class MtimeTest(_ProjectIndexTest, unittest.TestCase):
+    """without inotify (e.g., not on linux)"""
+    def make_index(self):
+        with unittest.mock.patch.object(
+                watcher, '_Inotify', side_effect=OSError):
+            return watcher.ProjectIndex(self.rootdir)
+
+    def set_mtime(self, relstr, mtime):
+        os.utime(str(self.rootdir / relstr), (mtime, mtime))
+
+    def test_listings_are_kept_until_mtime_changed(self):
+        self.set_mtime('d1', 1000000000)
+        self.listdir('d1')
+        (self.rootdir / 'd1' / 'new.md').touch()
+        self.set_mtime('d1', 1000000000)
+        # the change cannot be noticed without the mtime
+        self.assertEqual(self.listdir('d1'), [
+            ('b.md', False), ('sub', True)])
+        self.set_mtime('d1', 1000000001)
+        self.assertEqual(self.listdir('d1'), [
+            ('b.md', False), ('new.md', False), ('sub', True)])
+
+    def test_recent_directories_are_not_trusted(self):
+        self.listdir('d1')
+        (self.rootdir / 'd1' / 'new.md').touch()
+        self.set_mtime('d1', time.time() - 0.5)
+        self.assertIn(('new.md', False), self.listdir('d1'))
+
+
+if __name__ == '__main__':
+    unittest.main()